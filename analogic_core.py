@@ -9,11 +9,17 @@ analogic reasoning patterns between memory entries.
 import json
 import math
 import logging
+import os
+from collections import Counter
 from typing import Optional
 from uuid import UUID
 
-from database import get_connection
+import numpy as np
+
+from unit_of_work import after_commit, get_connection
+from graph_cache import DIRECTIONS, AssociationGraph, association_graphs
 from security import encrypt, decrypt, encrypt_with_user_key, decrypt_with_user_key, hash_content, sanitize_input
+from ranking import BM25Scorer, tokenize
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +44,153 @@ class AnalogicCore:
         "user_preference": "User-stated preference",
     }
 
+    # Relevance score blend (see compute_relevance_score / score_batch)
+    KEYWORD_WEIGHT = 0.45
+    FREQUENCY_WEIGHT = 0.15
+    RECENCY_WEIGHT = 0.30
+    CENTRALITY_WEIGHT = 0.10  # Graph importance prior (see importance.py)
+    FREQUENCY_SATURATION = math.log1p(100)  # normalize to ~1 at 100 accesses
+    RECENCY_DECAY_HOURS = 24.0
+
+    # Tag-overlap auto-association (see auto_associate)
+    AUTO_ASSOCIATE_FANOUT = int(os.getenv("AUTO_ASSOCIATE_FANOUT", "50"))
+    AUTO_ASSOCIATE_MIN_STRENGTH = 0.1
+
+    CONTEXT_MAX_EDGES = 200
+
+    # Hebbian forgetting: an association's effective strength decays
+    # exponentially since it was last reinforced, computed on read; edges
+    # decayed below ASSOCIATION_PRUNE_THRESHOLD are pruned by
+    # decay_weak_associations
+    ASSOCIATION_HALF_LIFE_DAYS = float(os.getenv("ASSOCIATION_HALF_LIFE_DAYS", "30"))  # 0 = no decay
+    DECAY_RATE = math.log(2) / (ASSOCIATION_HALF_LIFE_DAYS * 86400) if ASSOCIATION_HALF_LIFE_DAYS > 0 else 0.0
+    ASSOCIATION_PRUNE_THRESHOLD = float(os.getenv("ASSOCIATION_PRUNE_THRESHOLD", "0.05"))
+    SWEEP_CHUNK_SIZE = int(os.getenv("ASSOCIATION_SWEEP_CHUNK_SIZE", "1000"))
+
+    # strength * exp(-rate * seconds since last reinforcement), with the
+    # per-second decay rate bound as parameter {rate}
+    EFFECTIVE_STRENGTH_SQL = (
+        "{alias}strength * exp(-{rate}::float8 * GREATEST(EXTRACT(EPOCH FROM NOW() - {alias}last_reinforced_at), 0))"
+    )
+
+    # Spreading activation (see spread_activation): how well each association
+    # type carries activation, and how much of it survives each hop
+    ACTIVATION_TYPE_WEIGHTS = {
+        "related_to": 0.6,
+        "caused_by": 0.8,
+        "leads_to": 0.9,
+        "contradicts": 0.3,
+        "supports": 0.8,
+        "part_of": 0.7,
+        "similar_to": 0.9,
+        "opposite_of": 0.2,
+        "derived_from": 0.85,
+        "user_preference": 0.7,
+    }
+    ACTIVATION_HOP_DECAY = 0.6
+    ACTIVATION_REVERSE_FACTOR = 0.5   # Activation flowing against an edge's direction
+    ACTIVATION_MAX_FRONTIER = 256     # Nodes expanded per hop
+    ACTIVATION_MAX_EDGES = 20_000     # Edges examined per call
+
+    # Bounded graph traversal (see traverse)
+    TRAVERSE_MAX_DEPTH = 5
+    TRAVERSE_MAX_NODES = 1000
+    TRAVERSE_MAX_EDGES = 5000
+
+    # CTE marking the graphs of the users returned by the query {users} (a
+    # user_id column) for importance recomputation; rows are locked in user order
+    MARK_GRAPHS_DIRTY_CTE = """
+        marked AS (
+            INSERT INTO association_graph_dirty (user_id)
+            SELECT DISTINCT user_id FROM ({users}) AS u WHERE user_id IS NOT NULL ORDER BY user_id
+            ON CONFLICT (user_id) DO UPDATE SET marked_at = NOW(), claimed_until = NULL
+        )
+    """
+
+    # CTE for statements writing association rows returned by a CTE named
+    # {edges}: `owned` adds the owning user (when both ends share one) and node types
+    _EDGE_OWNERS_CTE = """
+        owned AS (
+            SELECT e.*,
+                   CASE WHEN me_s.user_id = me_t.user_id THEN me_s.user_id END AS user_id,
+                   me_s.memory_type AS source_type,
+                   me_t.memory_type AS target_type
+            FROM {edges} e
+            LEFT JOIN memory_entries me_s ON me_s.id = e.source_memory_id
+            LEFT JOIN memory_entries me_t ON me_t.id = e.target_memory_id
+        )
+    """
+
+    # As _EDGE_OWNERS_CTE, and the owner's graph is marked for importance recomputation
+    _OWNED_EDGES_CTES = _EDGE_OWNERS_CTE + "," + MARK_GRAPHS_DIRTY_CTE.format(users="SELECT user_id FROM owned")
+
+    @staticmethod
+    async def mark_graphs_dirty(conn, user_ids):
+        """
+        Mark users' association graphs for importance recomputation (see
+        importance.py). Call inside the transaction that changes the graphs.
+        """
+        if not user_ids:
+            return
+        await conn.execute(
+            """
+            INSERT INTO association_graph_dirty (user_id)
+            SELECT user_id FROM unnest($1::text[]) AS u(user_id) ORDER BY user_id
+            ON CONFLICT (user_id) DO UPDATE SET marked_at = NOW(), claimed_until = NULL
+            """,
+            sorted(set(user_ids))
+        )
+
+    # ─────────────────────────────────────────────
+    # ASSOCIATION GRAPH CACHE
+    # ─────────────────────────────────────────────
+
+    async def user_graph(self, user_id: str) -> AssociationGraph:
+        """The user's association graph from the in-memory cache, loaded on first use."""
+        return await association_graphs.get(user_id, lambda: self._load_graph(user_id))
+
+    async def _load_graph(self, user_id: str) -> AssociationGraph:
+        async with get_connection() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT ma.id, ma.source_memory_id, ma.target_memory_id, ma.association_type,
+                       ma.strength, ma.created_at, ma.last_reinforced_at,
+                       me_s.memory_type AS source_type,
+                       me_t.memory_type AS target_type
+                FROM memory_associations ma
+                JOIN memory_entries me_s ON ma.source_memory_id = me_s.id
+                JOIN memory_entries me_t ON ma.target_memory_id = me_t.id
+                WHERE me_s.user_id = $1 AND me_t.user_id = $1
+                  AND me_s.is_active AND me_t.is_active
+                """,
+                user_id
+            )
+        return AssociationGraph([dict(r) for r in rows], list(self.ASSOCIATION_TYPES), self.DECAY_RATE)
+
+    def _apply_edge_to_cache(self, row) -> dict:
+        """
+        Patch the owner's cached graph with a written edge once the write commits;
+        returns the edge's public fields.
+        """
+        edge = dict(row)
+        if edge["user_id"] is not None:
+            after_commit(lambda: association_graphs.upsert_edge(edge["user_id"], edge))
+        return self._edge_fields(edge)
+
+    @staticmethod
+    def _edge_fields(edge: dict) -> dict:
+        return {
+            key: edge[key]
+            for key in (
+                "id", "source_memory_id", "target_memory_id", "association_type", "strength",
+                "created_at", "last_reinforced_at",
+            )
+        }
+
+    # ─────────────────────────────────────────────
+    # ASSOCIATIONS
+    # ─────────────────────────────────────────────
+
     async def create_association(
         self,
         source_id: UUID,
@@ -53,16 +206,21 @@ class AnalogicCore:
 
         async with get_connection() as conn:
             row = await conn.fetchrow(
-                """
-                INSERT INTO memory_associations (source_memory_id, target_memory_id, association_type, strength)
-                VALUES ($1, $2, $3, $4)
-                ON CONFLICT (source_memory_id, target_memory_id, association_type)
-                DO UPDATE SET strength = $4
-                RETURNING id, source_memory_id, target_memory_id, association_type, strength, created_at
+                f"""
+                WITH upserted AS (
+                    INSERT INTO memory_associations (source_memory_id, target_memory_id, association_type, strength)
+                    VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (source_memory_id, target_memory_id, association_type)
+                    DO UPDATE SET strength = $4, last_reinforced_at = NOW()
+                    RETURNING id, source_memory_id, target_memory_id, association_type, strength, created_at,
+                              last_reinforced_at
+                ),
+                {self._OWNED_EDGES_CTES.format(edges="upserted")}
+                SELECT * FROM owned
                 """,
                 source_id, target_id, association_type, strength
             )
-        return dict(row)
+        return self._apply_edge_to_cache(row)
 
     async def get_associations(
         self,
@@ -70,53 +228,148 @@ class AnalogicCore:
         direction: str = "both",  # "outgoing", "incoming", "both"
         min_strength: float = 0.0,
         limit: int = 50,
+        user_id: Optional[str] = None,
     ) -> list[dict]:
-        """Retrieve all analogic associations for a memory node."""
+        """
+        Retrieve all analogic associations for a memory node, with their
+        effective (time-decayed) strengths.
+        With the owner's user_id, they are read from the cached association graph
+        (or, if that graph is too large to cache, from the owner's active memories).
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Unknown direction: {direction}. Valid directions: {list(DIRECTIONS)}")
+        if user_id is not None and not association_graphs.is_oversized(user_id):
+            graph = await self.user_graph(user_id)
+            edges = [
+                e for e in graph.edges_of([memory_id], direction) if e["strength"] >= min_strength
+            ]
+            edges.sort(key=lambda e: e["strength"], reverse=True)
+            return [self._edge_fields(e) for e in edges[:limit]]
+
         async with get_connection() as conn:
             if direction == "outgoing":
-                condition = "source_memory_id = $1"
+                condition = "ma.source_memory_id = $1"
             elif direction == "incoming":
-                condition = "target_memory_id = $1"
+                condition = "ma.target_memory_id = $1"
             else:
-                condition = "(source_memory_id = $1 OR target_memory_id = $1)"
+                condition = "(ma.source_memory_id = $1 OR ma.target_memory_id = $1)"
+            params = [memory_id, min_strength, limit, self.DECAY_RATE]
+            owner_join = ""
+            if user_id is not None:
+                params.append(user_id)
+                owner_join = """
+                    JOIN memory_entries me_s ON me_s.id = ma.source_memory_id
+                    JOIN memory_entries me_t ON me_t.id = ma.target_memory_id
+                """
+                condition += " AND me_s.user_id = $5 AND me_t.user_id = $5 AND me_s.is_active AND me_t.is_active"
 
             rows = await conn.fetch(
                 f"""
-                SELECT id, source_memory_id, target_memory_id,
-                       association_type, strength, created_at
-                FROM memory_associations
-                WHERE {condition} AND strength >= $2
+                SELECT * FROM (
+                    SELECT ma.id, ma.source_memory_id, ma.target_memory_id, ma.association_type,
+                           {self.EFFECTIVE_STRENGTH_SQL.format(alias="ma.", rate="$4")} AS strength,
+                           ma.created_at, ma.last_reinforced_at
+                    FROM memory_associations ma
+                    {owner_join}
+                    WHERE {condition} AND ma.strength >= $2
+                ) AS decayed
+                WHERE strength >= $2
                 ORDER BY strength DESC
                 LIMIT $3
                 """,
-                memory_id, min_strength, limit
+                *params
             )
         return [dict(r) for r in rows]
 
     async def strengthen_association(
         self, source_id: UUID, target_id: UUID, association_type: str, delta: float = 0.1
     ) -> Optional[dict]:
-        """Reinforce an existing association (Hebbian-like learning)."""
+        """
+        Reinforce an existing association (Hebbian-like learning): the decay
+        accumulated since its last reinforcement is folded into the stored
+        strength before delta is added, and the decay clock restarts.
+        """
         async with get_connection() as conn:
             row = await conn.fetchrow(
-                """
-                UPDATE memory_associations
-                SET strength = LEAST(1.0, strength + $4)
-                WHERE source_memory_id = $1 AND target_memory_id = $2 AND association_type = $3
-                RETURNING id, source_memory_id, target_memory_id, association_type, strength
+                f"""
+                WITH updated AS (
+                    UPDATE memory_associations
+                    SET strength = LEAST(1.0, {self.EFFECTIVE_STRENGTH_SQL.format(alias="", rate="$5")} + $4),
+                        last_reinforced_at = NOW()
+                    WHERE source_memory_id = $1 AND target_memory_id = $2 AND association_type = $3
+                    RETURNING id, source_memory_id, target_memory_id, association_type, strength, created_at,
+                              last_reinforced_at
+                ),
+                {self._OWNED_EDGES_CTES.format(edges="updated")}
+                SELECT * FROM owned
                 """,
-                source_id, target_id, association_type, delta
+                source_id, target_id, association_type, delta, self.DECAY_RATE
             )
-        return dict(row) if row else None
+        if not row:
+            return None
+        result = self._apply_edge_to_cache(row)
+        del result["created_at"]
+        return result
 
-    async def decay_weak_associations(self, threshold: float = 0.05) -> int:
-        """Remove associations that have decayed below the threshold."""
-        async with get_connection() as conn:
-            result = await conn.execute(
-                "DELETE FROM memory_associations WHERE strength < $1", threshold
-            )
-        count = int(result.split()[-1])
-        logger.info(f"Decayed {count} weak associations below threshold {threshold}.")
+    async def decay_weak_associations(
+        self, threshold: Optional[float] = None, chunk_size: Optional[int] = None
+    ) -> int:
+        """
+        Prune associations whose effective strength has decayed below the
+        threshold. The table is swept in key order, chunk_size edges per
+        statement, so no single statement scans or locks all of it; pruned
+        edges are removed from cached graphs as they go.
+        Returns the number of associations pruned.
+        """
+        threshold = self.ASSOCIATION_PRUNE_THRESHOLD if threshold is None else threshold
+        chunk_size = chunk_size or self.SWEEP_CHUNK_SIZE
+        count = 0
+        after = None
+        while True:
+            async with get_connection() as conn:
+                keyset = "" if after is None else "WHERE (source_memory_id, target_memory_id, association_type) > ($2, $3, $4)"
+                chunk = await conn.fetch(
+                    f"""
+                    SELECT source_memory_id, target_memory_id, association_type
+                    FROM memory_associations
+                    {keyset}
+                    ORDER BY source_memory_id, target_memory_id, association_type
+                    LIMIT $1
+                    """,
+                    chunk_size, *(after or ())
+                )
+                if not chunk:
+                    break
+                rows = await conn.fetch(
+                    f"""
+                    WITH deleted AS (
+                        DELETE FROM memory_associations ma
+                        USING unnest($1::uuid[], $2::uuid[], $3::text[]) AS c(source_id, target_id, association_type)
+                        WHERE ma.source_memory_id = c.source_id
+                          AND ma.target_memory_id = c.target_id
+                          AND ma.association_type = c.association_type
+                          AND {self.EFFECTIVE_STRENGTH_SQL.format(alias="ma.", rate="$5")} < $4
+                        RETURNING ma.id, ma.source_memory_id, ma.target_memory_id, ma.association_type,
+                                  ma.strength, ma.created_at, ma.last_reinforced_at
+                    ),
+                    {self._OWNED_EDGES_CTES.format(edges="deleted")}
+                    SELECT * FROM owned
+                    """,
+                    [r["source_memory_id"] for r in chunk],
+                    [r["target_memory_id"] for r in chunk],
+                    [r["association_type"] for r in chunk],
+                    threshold, self.DECAY_RATE
+                )
+            for row in rows:
+                if row["user_id"] is not None:
+                    association_graphs.remove_edge(
+                        row["user_id"], row["source_memory_id"], row["target_memory_id"], row["association_type"]
+                    )
+            count += len(rows)
+            if len(chunk) < chunk_size:
+                break
+            after = tuple(chunk[-1])
+        logger.info(f"Pruned {count} associations decayed below threshold {threshold}.")
         return count
 
     async def get_analogic_context(self, user_id: str, memory_ids: list[UUID]) -> dict:
@@ -127,24 +380,13 @@ class AnalogicCore:
         if not memory_ids:
             return {"nodes": [], "edges": []}
 
-        async with get_connection() as conn:
-            rows = await conn.fetch(
-                """
-                SELECT ma.*, 
-                       me_s.memory_type AS source_type,
-                       me_t.memory_type AS target_type
-                FROM memory_associations ma
-                JOIN memory_entries me_s ON ma.source_memory_id = me_s.id
-                JOIN memory_entries me_t ON ma.target_memory_id = me_t.id
-                WHERE (ma.source_memory_id = ANY($1) OR ma.target_memory_id = ANY($1))
-                  AND me_s.user_id = $2 AND me_t.user_id = $2
-                ORDER BY ma.strength DESC
-                LIMIT 200
-                """,
-                memory_ids, user_id
-            )
-
-        edges = [dict(r) for r in rows]
+        if association_graphs.is_oversized(user_id):
+            edges = await self._context_edges_from_db(user_id, memory_ids)
+        else:
+            graph = await self.user_graph(user_id)
+            edges = graph.edges_of(memory_ids, "both")
+            edges.sort(key=lambda e: e["strength"], reverse=True)
+            edges = edges[:self.CONTEXT_MAX_EDGES]
         node_ids = set()
         for e in edges:
             node_ids.add(str(e["source_memory_id"]))
@@ -156,73 +398,267 @@ class AnalogicCore:
             "total_connections": len(edges),
         }
 
+    async def _context_edges_from_db(self, user_id: str, memory_ids: list[UUID]) -> list[dict]:
+        """get_analogic_context edges by indexed lookup, for graphs too large to cache."""
+        async with get_connection() as conn:
+            rows = await conn.fetch(
+                f"""
+                SELECT * FROM (
+                    SELECT ma.id, ma.source_memory_id, ma.target_memory_id, ma.association_type,
+                           {self.EFFECTIVE_STRENGTH_SQL.format(alias="ma.", rate="$4")} AS strength,
+                           ma.created_at, ma.last_reinforced_at,
+                           me_s.memory_type AS source_type,
+                           me_t.memory_type AS target_type
+                    FROM memory_associations ma
+                    JOIN memory_entries me_s ON ma.source_memory_id = me_s.id
+                    JOIN memory_entries me_t ON ma.target_memory_id = me_t.id
+                    WHERE (ma.source_memory_id = ANY($1) OR ma.target_memory_id = ANY($1))
+                      AND me_s.user_id = $2 AND me_t.user_id = $2
+                      AND me_s.is_active AND me_t.is_active
+                ) AS decayed
+                ORDER BY strength DESC
+                LIMIT $3
+                """,
+                memory_ids, user_id, self.CONTEXT_MAX_EDGES, self.DECAY_RATE
+            )
+        return [dict(r) for r in rows]
+
+    async def traverse(
+        self,
+        user_id: str,
+        seeds: list[UUID],
+        max_depth: int = 2,
+        association_types: Optional[list[str]] = None,
+        direction: str = "both",  # "outgoing", "incoming", "both"
+        min_strength: float = 0.0,
+        max_nodes: int = 200,
+        max_edges: int = 500,
+    ) -> dict:
+        """
+        Walk the user's association graph breadth-first from the seed memories,
+        up to max_depth hops, following only edges of the given types (all by
+        default) and at least min_strength. Cycles are cut by visiting each
+        memory once; max_nodes / max_edges bound the result.
+        Returns the reached memories with their hop distance and the traversed
+        edges. Seeds without associations are not part of the graph and are omitted.
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Unknown direction: {direction}. Valid directions: {list(DIRECTIONS)}")
+        unknown = set(association_types or ()) - set(self.ASSOCIATION_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown association types: {sorted(unknown)}")
+
+        graph = await self.user_graph(user_id)
+        type_codes = None
+        if association_types is not None:
+            type_codes = {graph.type_codes[t] for t in association_types if t in graph.type_codes}
+        depth_of, edges, truncated = graph.traverse(
+            seeds,
+            max_depth=min(max_depth, self.TRAVERSE_MAX_DEPTH),
+            direction=direction,
+            type_codes=type_codes,
+            min_strength=min_strength,
+            max_nodes=min(max_nodes, self.TRAVERSE_MAX_NODES),
+            max_edges=min(max_edges, self.TRAVERSE_MAX_EDGES),
+        )
+        nodes = [
+            {"id": str(graph.node_ids[node]), "memory_type": graph.node_types[node], "depth": depth}
+            for node, depth in depth_of.items()
+        ]
+        return {
+            "nodes": nodes,
+            "edges": [self._edge_fields(e) for e in edges],
+            "truncated": truncated,
+        }
+
+    async def spread_activation(
+        self,
+        user_id: str,
+        seeds: dict[UUID, float],
+        max_depth: int = 3,
+        fanout: int = 10,
+        threshold: float = 0.05,
+        type_weights: Optional[dict[str, float]] = None,
+    ) -> list[dict]:
+        """
+        Spread activation from seed memories through the user's association graph.
+        Each hop passes a node's incoming pulse to its neighbours, scaled by edge
+        strength, association type weight and ACTIVATION_HOP_DECAY (and
+        ACTIVATION_REVERSE_FACTOR against an edge's direction). Only the `fanout`
+        strongest edges per node and direction carry activation, pulses below
+        `threshold` are dropped, and at most ACTIVATION_MAX_FRONTIER nodes per
+        hop / ACTIVATION_MAX_EDGES edges per call are expanded.
+        Returns every activated memory (seeds included) with its total
+        activation and the hop it was first reached at, strongest first.
+        """
+        graph = await self.user_graph(user_id)
+        overrides = {name: min(max(weight, 0.0), 1.0) for name, weight in (type_weights or {}).items()}
+        weights = {**self.ACTIVATION_TYPE_WEIGHTS, **overrides}
+        type_weight = np.array([weights.get(name, 0.0) for name in graph.type_names])
+
+        activation: dict[UUID, float] = {}
+        hops: dict[UUID, int] = {}
+        for memory_id, value in seeds.items():
+            activation[memory_id] = activation.get(memory_id, 0.0) + value
+            hops[memory_id] = 0
+
+        n_nodes = len(graph.node_ids)
+        frontier = {graph.node_index[m]: v for m, v in seeds.items() if m in graph.node_index}
+        edges_seen = 0
+        for depth in range(1, max_depth + 1):
+            if not frontier or edges_seen >= self.ACTIVATION_MAX_EDGES:
+                break
+            pulse = np.zeros(n_nodes)
+            expanded = sorted(frontier.items(), key=lambda item: item[1], reverse=True)
+            for node, energy in expanded[:self.ACTIVATION_MAX_FRONTIER]:
+                for direction, factor in (("outgoing", 1.0), ("incoming", self.ACTIVATION_REVERSE_FACTOR)):
+                    if edges_seen >= self.ACTIVATION_MAX_EDGES:
+                        break
+                    # A hub's edges are cut off at the remaining budget
+                    neighbours, strengths, types = graph.adjacency(
+                        node, direction, limit=self.ACTIVATION_MAX_EDGES - edges_seen
+                    )
+                    if not len(neighbours):
+                        continue
+                    edges_seen += len(neighbours)
+                    flow = strengths * type_weight[types] * factor
+                    if len(flow) > fanout:
+                        keep = np.argpartition(-flow, fanout - 1)[:fanout]
+                        neighbours, flow = neighbours[keep], flow[keep]
+                    np.add.at(pulse, neighbours, energy * self.ACTIVATION_HOP_DECAY * flow)
+
+            reached = np.flatnonzero(pulse >= threshold)
+            frontier = {}
+            for node in reached.tolist():
+                memory_id = graph.node_ids[node]
+                activation[memory_id] = activation.get(memory_id, 0.0) + float(pulse[node])
+                hops.setdefault(memory_id, depth)
+                frontier[node] = float(pulse[node])
+
+        ranked = sorted(activation.items(), key=lambda item: item[1], reverse=True)
+        return [
+            {"id": memory_id, "activation": round(value, 4), "hops": hops[memory_id]}
+            for memory_id, value in ranked
+        ]
+
     def compute_relevance_score(
         self,
         query_keywords: list[str],
         memory_content: str,
         access_count: int = 0,
         recency_hours: float = 0,
+        scorer: Optional[BM25Scorer] = None,
+        centrality: float = 0,
     ) -> float:
         """
         Compute a relevance score for a memory given a query.
-        Combines keyword overlap, access frequency, and recency.
+        Combines BM25 keyword relevance, access frequency, recency, and the
+        memory's importance in the association graph (0 to 1).
+        Pass a scorer built from the user's corpus statistics for real IDF
+        weighting; without one every query term is weighted equally.
         """
         if not memory_content or not query_keywords:
             return 0.0
 
-        content_lower = memory_content.lower()
-        keywords_lower = [k.lower() for k in query_keywords]
+        if scorer is None:
+            scorer = BM25Scorer(tokenize(" ".join(query_keywords)))
 
-        # Keyword overlap score (0 to 1)
-        matches = sum(1 for kw in keywords_lower if kw in content_lower)
-        keyword_score = matches / max(len(keywords_lower), 1)
+        # BM25 keyword score (0 to 1)
+        doc_terms = tokenize(memory_content)
+        keyword_score = scorer.normalized_score(Counter(doc_terms), len(doc_terms))
 
         # Frequency score (logarithmic)
-        freq_score = math.log1p(access_count) / math.log1p(100)  # normalize to ~1 at 100 accesses
+        freq_score = math.log1p(access_count) / self.FREQUENCY_SATURATION
 
-        # Recency score (exponential decay, half-life = 24 hours)
-        recency_score = math.exp(-recency_hours / 24.0)
+        # Recency score (exponential decay over 24 hours)
+        recency_score = math.exp(-recency_hours / self.RECENCY_DECAY_HOURS)
 
         # Weighted combination
-        total = (0.50 * keyword_score) + (0.20 * freq_score) + (0.30 * recency_score)
+        total = (
+            self.KEYWORD_WEIGHT * keyword_score
+            + self.FREQUENCY_WEIGHT * freq_score
+            + self.RECENCY_WEIGHT * recency_score
+            + self.CENTRALITY_WEIGHT * centrality
+        )
         return round(min(1.0, total), 4)
 
+    def score_batch(
+        self,
+        scorer: BM25Scorer,
+        term_frequencies: np.ndarray,
+        doc_lengths: np.ndarray,
+        access_counts: np.ndarray,
+        recency_hours: np.ndarray,
+        centrality: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Vectorized compute_relevance_score for a whole candidate window.
+        term_frequencies is an (n_docs, n_query_terms) matrix in scorer.query_terms order.
+        """
+        keyword_scores = scorer.normalized_scores(term_frequencies, doc_lengths)
+        freq_scores = np.log1p(np.asarray(access_counts, dtype=np.float64)) / self.FREQUENCY_SATURATION
+        recency_scores = np.exp(-np.asarray(recency_hours, dtype=np.float64) / self.RECENCY_DECAY_HOURS)
+        total = (
+            self.KEYWORD_WEIGHT * keyword_scores
+            + self.FREQUENCY_WEIGHT * freq_scores
+            + self.RECENCY_WEIGHT * recency_scores
+        )
+        if centrality is not None:
+            total = total + self.CENTRALITY_WEIGHT * np.asarray(centrality, dtype=np.float64)
+        return np.round(np.minimum(total, 1.0), 4)
+
     async def auto_associate(
-        self, new_memory_id: UUID, user_id: str, content: str, tags: list[str]
+        self, new_memory_id: UUID, user_id: str, content: str, tags: list[str],
+        fanout: Optional[int] = None, mark_dirty: bool = True,
     ) -> int:
         """
         Automatically find and create associations for a new memory entry
         based on tag overlap with existing memories.
+        Strength is computed and all associations are upserted in a single
+        set-based statement; up to `fanout` best-overlapping memories are linked.
+        With mark_dirty=False the caller marks the user's graph for importance
+        recomputation itself (see mark_graphs_dirty) when associations were created.
         """
         if not tags:
             return 0
+        fanout = fanout or self.AUTO_ASSOCIATE_FANOUT
+        owner_ctes = self._OWNED_EDGES_CTES if mark_dirty else self._EDGE_OWNERS_CTE
 
         async with get_connection() as conn:
-            # Find memories sharing at least one tag
-            existing = await conn.fetch(
-                """
-                SELECT id, tags FROM memory_entries
-                WHERE user_id = $1 AND id != $2 AND is_active = TRUE
-                  AND tags && $3
-                LIMIT 50
+            rows = await conn.fetch(
+                f"""
+                WITH candidates AS (
+                    SELECT id,
+                           cardinality(ARRAY(
+                               SELECT unnest(tags) INTERSECT SELECT unnest($3::text[])
+                           )) AS shared_tags,
+                           cardinality(tags) AS tag_count
+                    FROM memory_entries
+                    WHERE user_id = $1 AND id != $2 AND is_active = TRUE
+                      AND tags && $3
+                    ORDER BY shared_tags DESC, created_at DESC
+                    LIMIT $4
+                ),
+                scored AS (
+                    SELECT id, shared_tags::float / GREATEST($5, tag_count, 1) AS strength
+                    FROM candidates
+                ),
+                upserted AS (
+                    INSERT INTO memory_associations (source_memory_id, target_memory_id, association_type, strength)
+                    SELECT $2, id, 'related_to', round(strength::numeric, 3)::float
+                    FROM scored
+                    WHERE strength >= $6
+                    ON CONFLICT (source_memory_id, target_memory_id, association_type)
+                    DO UPDATE SET strength = EXCLUDED.strength, last_reinforced_at = NOW()
+                    RETURNING id, source_memory_id, target_memory_id, association_type, strength, created_at,
+                              last_reinforced_at
+                ),
+                {owner_ctes.format(edges="upserted")}
+                SELECT * FROM owned
                 """,
-                user_id, new_memory_id, tags
+                user_id, new_memory_id, tags, fanout, len(tags), self.AUTO_ASSOCIATE_MIN_STRENGTH
             )
 
-        created = 0
-        for row in existing:
-            shared_tags = set(row["tags"]) & set(tags)
-            strength = len(shared_tags) / max(len(tags), len(row["tags"]), 1)
-            if strength >= 0.1:
-                try:
-                    await self.create_association(
-                        source_id=new_memory_id,
-                        target_id=row["id"],
-                        association_type="related_to",
-                        strength=round(strength, 3),
-                    )
-                    created += 1
-                except Exception as e:
-                    logger.warning(f"Auto-associate failed: {e}")
-
-        return created
+        for row in rows:
+            self._apply_edge_to_cache(row)
+        return len(rows)
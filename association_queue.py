@@ -0,0 +1,148 @@
+"""
+association_queue.py - Background Association Job Queue
+Analogic Memory System for Omnira Synora AI
+
+Moves tag-based auto-association off the store path. store_memory
+enqueues a job in the same transaction as the insert; workers started
+from the app lifespan claim jobs with FOR UPDATE SKIP LOCKED, run
+AnalogicCore.auto_associate and record the outcome on the memory's
+association_status (pending / done / failed).
+"""
+
+import asyncio
+import logging
+import os
+from uuid import UUID
+
+from analogic_core import AnalogicCore
+from unit_of_work import get_connection, savepoint, unit_of_work
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ASSOCIATION_WORKERS = int(os.getenv("ASSOCIATION_WORKERS", "2"))  # 0 = associate inline on store
+ASSOCIATION_MAX_ATTEMPTS = int(os.getenv("ASSOCIATION_MAX_ATTEMPTS", "5"))
+ASSOCIATION_BATCH_SIZE = int(os.getenv("ASSOCIATION_BATCH_SIZE", "20"))
+ASSOCIATION_POLL_INTERVAL_SECONDS = float(os.getenv("ASSOCIATION_POLL_INTERVAL_SECONDS", "1"))
+ASSOCIATION_RETRY_BASE_SECONDS = 5
+ASSOCIATION_RETRY_MAX_SECONDS = 300
+
+
+class AssociationJobQueue:
+    """
+    Durable PostgreSQL-backed queue of auto-association jobs.
+    A claimed job stays row-locked inside its worker's transaction until it
+    completes, so a crashed worker simply releases it back to the queue.
+    """
+
+    def __init__(self):
+        self.analogic = AnalogicCore()
+
+    @property
+    def enabled(self) -> bool:
+        return ASSOCIATION_WORKERS > 0
+
+    async def enqueue(self, memory_id: UUID, user_id: str, tags: list[str]):
+        """Queue auto-association for a memory (joins the caller's unit of work)."""
+        async with get_connection() as conn:
+            await conn.execute(
+                "INSERT INTO association_jobs (memory_id, user_id, tags) VALUES ($1, $2, $3)",
+                memory_id, user_id, tags
+            )
+
+    async def process_batch(self, batch_size: int = ASSOCIATION_BATCH_SIZE) -> int:
+        """Claim and run up to batch_size ready jobs. Returns the number of jobs handled."""
+        async with unit_of_work() as conn:
+            jobs = await conn.fetch(
+                """
+                SELECT j.id, j.memory_id, j.user_id, j.tags, j.attempts, me.is_active
+                FROM association_jobs j
+                LEFT JOIN memory_entries me ON me.id = j.memory_id
+                WHERE j.status = 'pending' AND j.run_after <= NOW()
+                ORDER BY j.run_after
+                LIMIT $1
+                FOR UPDATE OF j SKIP LOCKED
+                """,
+                batch_size
+            )
+
+            dirty_users = set()
+            for job in jobs:
+                if not job["is_active"]:
+                    # Memory was deleted (or purged) before its associations were built
+                    await conn.execute("DELETE FROM association_jobs WHERE id = $1", job["id"])
+                    continue
+                try:
+                    async with savepoint():
+                        created = await self.analogic.auto_associate(
+                            job["memory_id"], job["user_id"], "", job["tags"], mark_dirty=False
+                        )
+                        await conn.execute(
+                            "UPDATE memory_entries SET association_status = 'done' WHERE id = $1",
+                            job["memory_id"]
+                        )
+                        await conn.execute("DELETE FROM association_jobs WHERE id = $1", job["id"])
+                    logger.debug(f"Association job {job['id']}: {created} associations for {job['memory_id']}")
+                    if created:
+                        dirty_users.add(job["user_id"])
+                except Exception as e:
+                    await self._record_failure(conn, job, e)
+
+            # Marked once per batch, in user order, so concurrent workers never
+            # hold each other's dirty-marker row locks across jobs
+            await self.analogic.mark_graphs_dirty(conn, dirty_users)
+
+        return len(jobs)
+
+    async def _record_failure(self, conn, job, error: Exception):
+        attempts = job["attempts"] + 1
+        if attempts >= ASSOCIATION_MAX_ATTEMPTS:
+            logger.error(f"Association job {job['id']} failed permanently after {attempts} attempts: {error}")
+            await conn.execute(
+                "UPDATE association_jobs SET status = 'failed', attempts = $2, last_error = $3 WHERE id = $1",
+                job["id"], attempts, str(error)
+            )
+            await conn.execute(
+                "UPDATE memory_entries SET association_status = 'failed' WHERE id = $1",
+                job["memory_id"]
+            )
+            return
+
+        delay = min(ASSOCIATION_RETRY_BASE_SECONDS * 2 ** (attempts - 1), ASSOCIATION_RETRY_MAX_SECONDS)
+        logger.warning(f"Association job {job['id']} attempt {attempts} failed, retrying in {delay}s: {error}")
+        await conn.execute(
+            """
+            UPDATE association_jobs
+            SET attempts = $2, last_error = $3, run_after = NOW() + make_interval(secs => $4)
+            WHERE id = $1
+            """,
+            job["id"], attempts, str(error), float(delay)
+        )
+
+    async def work_forever(self, worker_id: int):
+        """Worker loop: drain ready jobs, then poll."""
+        while True:
+            try:
+                handled = await self.process_batch()
+            except Exception as e:
+                logger.warning(f"Association worker {worker_id} error: {e}")
+                handled = 0
+            if not handled:
+                await asyncio.sleep(ASSOCIATION_POLL_INTERVAL_SECONDS)
+
+    async def stats(self) -> dict:
+        """Job counts by status."""
+        async with get_connection() as conn:
+            rows = await conn.fetch("SELECT status, COUNT(*) AS jobs FROM association_jobs GROUP BY status")
+        return {r["status"]: r["jobs"] for r in rows}
+
+
+association_queue = AssociationJobQueue()
+
+
+async def run_association_workers():
+    """Background task running ASSOCIATION_WORKERS concurrent queue workers."""
+    if not association_queue.enabled:
+        logger.info("Association workers disabled; associations are built inline on store.")
+        return
+    await asyncio.gather(*(association_queue.work_forever(i) for i in range(ASSOCIATION_WORKERS)))
@@ -20,8 +20,11 @@ from pathlib import Path
 from typing import Optional
 from uuid import UUID
 
-from database import get_connection
+from unit_of_work import get_connection
 from security import checksum_bytes, decrypt_with_user_key
+from memory_cache import working_set
+from memory_engine import bump_memory_generations
+from analogic_core import AnalogicCore
 
 logger = logging.getLogger(__name__)
 
@@ -140,7 +143,8 @@ class BackupSystem:
                     """
                     SELECT id, user_id, session_id, memory_type, scope,
                            content_encrypted, content_hash, tags, relevance_score,
-                           access_count, created_at, updated_at, expires_at
+                           access_count, created_at, updated_at, expires_at, key_version,
+                           keyword_tokens
                     FROM memory_entries WHERE user_id = $1
                     """,
                     user_id
@@ -150,7 +154,8 @@ class BackupSystem:
                     """
                     SELECT id, user_id, session_id, memory_type, scope,
                            content_encrypted, content_hash, tags, relevance_score,
-                           access_count, created_at, updated_at, expires_at
+                           access_count, created_at, updated_at, expires_at, key_version,
+                           keyword_tokens
                     FROM memory_entries
                     """
                 )
@@ -253,6 +258,16 @@ class BackupSystem:
         restored_memories = await self._import_memories(export.get("memory_entries", []))
         restored_sessions = await self._import_sessions(export.get("context_sessions", []))
 
+        # Drop cached working sets and recall results of every user touched by the
+        # restore, and have their graph importance scores recomputed
+        restored_users = {entry.get("user_id") for entry in export.get("memory_entries", [])} - {None}
+        if restored_users:
+            async with get_connection() as conn:
+                await bump_memory_generations(conn, restored_users)
+                await AnalogicCore.mark_graphs_dirty(conn, restored_users)
+        for user_id in restored_users:
+            working_set.invalidate_user(user_id)
+
         logger.info(f"Restore complete. Memories: {restored_memories}, Sessions: {restored_sessions}")
         return {
             "status": "success",
@@ -278,9 +293,10 @@ class BackupSystem:
                         """
                         INSERT INTO memory_entries
                             (id, user_id, session_id, memory_type, scope, content_encrypted,
-                             content_hash, tags, relevance_score, access_count, created_at, expires_at)
-                        VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12)
-                        ON CONFLICT (id) DO NOTHING
+                             content_hash, tags, relevance_score, access_count, created_at, expires_at,
+                             key_version, keyword_tokens)
+                        VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12,$13,$14)
+                        ON CONFLICT DO NOTHING
                         """,
                         UUID(entry["id"]),
                         entry["user_id"],
@@ -290,10 +306,12 @@ class BackupSystem:
                         enc_bytes,
                         entry["content_hash"],
                         entry.get("tags") or [],
-                        entry.get("relevance_score", 1.0),
+                        entry.get("relevance_score"),
                         entry.get("access_count", 0),
                         datetime.fromisoformat(entry["created_at"]),
                         datetime.fromisoformat(entry["expires_at"]) if entry.get("expires_at") else None,
+                        entry.get("key_version", 1),
+                        entry.get("keyword_tokens"),
                     )
                     count += 1
                 except Exception as e:
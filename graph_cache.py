@@ -0,0 +1,528 @@
+"""
+graph_cache.py - In-Memory Association Graph Cache
+Analogic Memory System for Omnira Synora AI
+
+Keeps each active user's memory_associations graph in process memory as
+compressed sparse row (CSR) arrays, so neighbourhood reads are array
+slices instead of SQL round trips. Graphs are loaded lazily on first
+read, patched in place when this process writes an association, and
+reloaded after GRAPH_CACHE_TTL_SECONDS to pick up writes made by other
+workers. Total size is bounded by GRAPH_CACHE_MAX_BYTES (LRU by user);
+a graph larger than the whole budget is not cached, and callers query
+the database directly for that user (see is_oversized).
+Edges keep their stored strength and last reinforcement time; every read
+reports the time-decayed (effective) strength. Also provides weighted
+personalized PageRank over edge arrays, used for importance scores.
+
+Used only from the event loop thread; no locking is required.
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+from uuid import UUID
+
+import numpy as np
+
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+GRAPH_CACHE_MAX_BYTES = int(os.getenv("GRAPH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+GRAPH_CACHE_TTL_SECONDS = float(os.getenv("GRAPH_CACHE_TTL_SECONDS", "60"))
+GRAPH_OVERLAY_MAX_EDGES = 512  # Pending edge inserts before the CSR arrays are rebuilt
+GRAPH_OVERSIZE_RECHECK_SECONDS = 3600  # How long a graph over the byte budget is not loaded again
+
+_NODE_OVERHEAD_BYTES = 200  # UUID, type string, index dict entry
+_EDGE_OVERHEAD_BYTES = 150  # edge id UUID, created_at, last_reinforced_at
+
+DIRECTIONS = ("outgoing", "incoming", "both")
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-6
+PAGERANK_MAX_ITERATIONS = 100
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    """Unix time of a reinforcement timestamp (now when unknown)."""
+    if value is None:
+        return time.time()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class AssociationGraph:
+    """
+    One user's association graph. Nodes are memories, numbered in load order;
+    edges live in parallel arrays with two CSR indexes (by source and by
+    target). Edges added after the last build sit in a small overlay until
+    the next rebuild; removed edges are masked out. Strengths decay
+    exponentially at decay_rate per second since each edge's last reinforcement.
+    """
+
+    def __init__(self, edges: list[dict], type_names: list[str], decay_rate: float = 0.0):
+        self.loaded_at = time.monotonic()
+        self.decay_rate = decay_rate
+        self.type_names = list(type_names)
+        self.type_codes = {name: code for code, name in enumerate(self.type_names)}
+        self.node_ids: list[UUID] = []
+        self.node_types: list[Optional[str]] = []
+        self.node_index: dict[UUID, int] = {}
+        self._build(edges)
+
+    # ── construction ──────────────────────────────
+
+    def _node(self, memory_id: UUID, memory_type: Optional[str] = None) -> int:
+        idx = self.node_index.get(memory_id)
+        if idx is None:
+            idx = len(self.node_ids)
+            self.node_index[memory_id] = idx
+            self.node_ids.append(memory_id)
+            self.node_types.append(memory_type)
+        elif memory_type is not None:
+            self.node_types[idx] = memory_type
+        return idx
+
+    def _type_code(self, association_type: str) -> int:
+        code = self.type_codes.get(association_type)
+        if code is None:
+            code = self.type_codes[association_type] = len(self.type_names)
+            self.type_names.append(association_type)
+        return code
+
+    def _build(self, edges: list[dict]):
+        n_edges = len(edges)
+        self.src = np.empty(n_edges, dtype=np.int32)
+        self.dst = np.empty(n_edges, dtype=np.int32)
+        self.etype = np.empty(n_edges, dtype=np.int16)
+        self.strength = np.empty(n_edges, dtype=np.float64)
+        self.reinforced = np.empty(n_edges, dtype=np.float64)  # Unix time of last reinforcement
+        self.alive = np.ones(n_edges, dtype=bool)
+        self.edge_ids: list = []
+        self.created_at: list[Optional[datetime]] = []
+        for i, e in enumerate(edges):
+            self.src[i] = self._node(e["source_memory_id"], e.get("source_type"))
+            self.dst[i] = self._node(e["target_memory_id"], e.get("target_type"))
+            self.etype[i] = self._type_code(e["association_type"])
+            self.strength[i] = e["strength"]
+            self.reinforced[i] = _timestamp(e.get("last_reinforced_at"))
+            self.edge_ids.append(e.get("id"))
+            self.created_at.append(e.get("created_at"))
+
+        n_nodes = len(self.node_ids)
+        self.out_order = np.argsort(self.src, kind="stable").astype(np.int32)
+        self.out_indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.src, minlength=n_nodes), out=self.out_indptr[1:])
+        self.in_order = np.argsort(self.dst, kind="stable").astype(np.int32)
+        self.in_indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.dst, minlength=n_nodes), out=self.in_indptr[1:])
+
+        self._overlay: list[dict] = []
+        self._overlay_out: dict[int, list[int]] = {}
+        self._overlay_in: dict[int, list[int]] = {}
+
+    def _all_edges(self) -> list[dict]:
+        """Every live edge with its stored (undecayed) strength."""
+        edges = [self._base_edge(i, decayed=False) for i in np.flatnonzero(self.alive)]
+        edges += [self._overlay_edge(e, decayed=False) for e in self._overlay if e["alive"]]
+        return edges
+
+    def compact(self):
+        """Fold the overlay and removals into freshly built CSR arrays."""
+        loaded_at = self.loaded_at
+        edges = self._all_edges()
+        self.node_ids, self.node_types, self.node_index = [], [], {}
+        self._build(edges)
+        self.loaded_at = loaded_at
+
+    # ── reads ─────────────────────────────────────
+
+    def effective_strength(self, strength, reinforced):
+        """Stored strength(s) decayed for the time elapsed since reinforcement (Unix times)."""
+        if not self.decay_rate:
+            return strength
+        age = np.maximum(time.time() - np.asarray(reinforced, dtype=np.float64), 0.0)
+        return strength * np.exp(-self.decay_rate * age)
+
+    def _base_edge(self, i: int, decayed: bool = True) -> dict:
+        strength = self.strength[i]
+        if decayed:
+            strength = self.effective_strength(strength, self.reinforced[i])
+        return {
+            "id": self.edge_ids[i],
+            "source_memory_id": self.node_ids[self.src[i]],
+            "target_memory_id": self.node_ids[self.dst[i]],
+            "association_type": self.type_names[self.etype[i]],
+            "strength": float(strength),
+            "created_at": self.created_at[i],
+            "last_reinforced_at": datetime.fromtimestamp(self.reinforced[i], timezone.utc),
+            "source_type": self.node_types[self.src[i]],
+            "target_type": self.node_types[self.dst[i]],
+        }
+
+    def _overlay_edge(self, e: dict, decayed: bool = True) -> dict:
+        edge = {key: value for key, value in e.items() if key not in ("alive", "reinforced")}
+        if decayed:
+            edge["strength"] = float(self.effective_strength(e["strength"], e["reinforced"]))
+        return edge
+
+    def _base_slice(self, node: int, direction: str) -> np.ndarray:
+        """Indices of live base edges leaving (outgoing) or entering (incoming) a node."""
+        if direction == "outgoing":
+            indptr, order = self.out_indptr, self.out_order
+        else:
+            indptr, order = self.in_indptr, self.in_order
+        if node >= len(indptr) - 1:
+            return np.empty(0, dtype=np.int32)
+        edge_idx = order[indptr[node]:indptr[node + 1]]
+        return edge_idx[self.alive[edge_idx]]
+
+    def adjacency(
+        self, node: int, direction: str, limit: Optional[int] = None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (neighbour node indices, effective strengths, type codes) of a node's live
+        edges in one direction ("outgoing" or "incoming"), including overlay edges;
+        at most `limit` of them when given.
+        """
+        edge_idx = self._base_slice(node, direction)
+        if limit is not None:
+            edge_idx = edge_idx[:max(limit, 0)]
+        ends = self.dst if direction == "outgoing" else self.src
+        neighbours, strengths, types = ends[edge_idx], self.strength[edge_idx], self.etype[edge_idx]
+        reinforced = self.reinforced[edge_idx]
+        pending = (self._overlay_out if direction == "outgoing" else self._overlay_in).get(node)
+        if pending:
+            extra = [self._overlay[j] for j in pending if self._overlay[j]["alive"]]
+            if limit is not None:
+                extra = extra[:max(limit - len(edge_idx), 0)]
+            key = "target_memory_id" if direction == "outgoing" else "source_memory_id"
+            neighbours = np.concatenate([neighbours, [self.node_index[e[key]] for e in extra]]).astype(np.int32)
+            strengths = np.concatenate([strengths, [e["strength"] for e in extra]])
+            reinforced = np.concatenate([reinforced, [e["reinforced"] for e in extra]])
+            types = np.concatenate([types, [self.type_codes[e["association_type"]] for e in extra]]).astype(np.int16)
+        return neighbours, self.effective_strength(strengths, reinforced), types
+
+    def edges_of(self, memory_ids: list[UUID], direction: str = "both") -> list[dict]:
+        """Live edges incident to any of the given memories (each edge once), with effective strengths."""
+        directions = ("outgoing", "incoming") if direction == "both" else (direction,)
+        base: set[int] = set()
+        overlay: set[int] = set()
+        for memory_id in memory_ids:
+            node = self.node_index.get(memory_id)
+            if node is None:
+                continue
+            for d in directions:
+                base.update(self._base_slice(node, d).tolist())
+                pending = (self._overlay_out if d == "outgoing" else self._overlay_in).get(node, ())
+                overlay.update(j for j in pending if self._overlay[j]["alive"])
+        return [self._base_edge(i) for i in base] + [self._overlay_edge(self._overlay[j]) for j in overlay]
+
+    def _incident(
+        self, node: int, direction: str, allowed: Optional[set[int]], min_strength: float
+    ) -> list[tuple[float, bool, int]]:
+        """
+        (effective strength, is_base, index) of a node's live edges in one
+        direction passing the filters, strongest first.
+        """
+        edge_idx = self._base_slice(node, direction)
+        strengths = self.effective_strength(self.strength[edge_idx], self.reinforced[edge_idx])
+        keep = strengths >= min_strength
+        if allowed is not None:
+            keep &= np.isin(self.etype[edge_idx], list(allowed))
+        found = [(float(strength), True, int(i)) for strength, i in zip(strengths[keep], edge_idx[keep])]
+        for j in (self._overlay_out if direction == "outgoing" else self._overlay_in).get(node, ()):
+            e = self._overlay[j]
+            if not e["alive"] or (allowed is not None and self.type_codes[e["association_type"]] not in allowed):
+                continue
+            strength = float(self.effective_strength(e["strength"], e["reinforced"]))
+            if strength >= min_strength:
+                found.append((strength, False, j))
+        found.sort(reverse=True)
+        return found
+
+    def traverse(
+        self,
+        seeds: list[UUID],
+        max_depth: int,
+        direction: str = "both",
+        type_codes: Optional[set[int]] = None,
+        min_strength: float = 0.0,
+        max_nodes: int = 200,
+        max_edges: int = 500,
+    ) -> tuple[dict[int, int], list[dict], bool]:
+        """
+        Breadth-first traversal from the seed memories along edges of the given
+        types and minimum strength, strongest edges first. Every node is
+        expanded at most once, so cycles terminate; edges closing a cycle are
+        still reported. Returns {node index: hop first reached}, the traversed
+        edges (each once) and whether the node or edge budget cut it short.
+        """
+        directions = ("outgoing", "incoming") if direction == "both" else (direction,)
+        depth_of: dict[int, int] = {}
+        for memory_id in seeds:
+            node = self.node_index.get(memory_id)
+            if node is not None:
+                depth_of.setdefault(node, 0)
+
+        edges: list[dict] = []
+        seen: set[tuple[bool, int]] = set()
+        truncated = False
+        frontier = list(depth_of)
+        for depth in range(1, max_depth + 1):
+            next_frontier = []
+            for node in frontier:
+                for d in directions:
+                    for _, is_base, i in self._incident(node, d, type_codes, min_strength):
+                        if (is_base, i) in seen:
+                            continue
+                        if len(edges) >= max_edges:
+                            return depth_of, edges, True
+                        if is_base:
+                            other = int(self.dst[i] if d == "outgoing" else self.src[i])
+                        else:
+                            key = "target_memory_id" if d == "outgoing" else "source_memory_id"
+                            other = self.node_index[self._overlay[i][key]]
+                        if other not in depth_of:
+                            if len(depth_of) >= max_nodes:
+                                truncated = True
+                                continue
+                            depth_of[other] = depth
+                            next_frontier.append(other)
+                        seen.add((is_base, i))
+                        edges.append(self._base_edge(i) if is_base else self._overlay_edge(self._overlay[i]))
+            frontier = next_frontier
+            if not frontier:
+                break
+        return depth_of, edges, truncated
+
+    # ── incremental updates ───────────────────────
+
+    def _find(self, source_id: UUID, target_id: UUID, association_type: str) -> tuple[str, Optional[int]]:
+        """Locate a live edge: ("base", index), ("overlay", index) or ("", None)."""
+        src = self.node_index.get(source_id)
+        dst = self.node_index.get(target_id)
+        code = self.type_codes.get(association_type)
+        if src is None or dst is None or code is None:
+            return "", None
+        edge_idx = self._base_slice(src, "outgoing")
+        match = edge_idx[(self.dst[edge_idx] == dst) & (self.etype[edge_idx] == code)]
+        if len(match):
+            return "base", int(match[0])
+        for j in self._overlay_out.get(src, ()):
+            e = self._overlay[j]
+            if e["alive"] and e["target_memory_id"] == target_id and e["association_type"] == association_type:
+                return "overlay", j
+        return "", None
+
+    def upsert_edge(self, edge: dict):
+        """Insert an edge, or update the stored strength and reinforcement time of an existing one."""
+        reinforced_at = edge.get("last_reinforced_at")
+        where, i = self._find(edge["source_memory_id"], edge["target_memory_id"], edge["association_type"])
+        if where == "base":
+            self.strength[i] = edge["strength"]
+            self.reinforced[i] = _timestamp(reinforced_at)
+            return
+        if where == "overlay":
+            self._overlay[i].update(
+                strength=float(edge["strength"]), last_reinforced_at=reinforced_at, reinforced=_timestamp(reinforced_at)
+            )
+            return
+
+        src = self._node(edge["source_memory_id"], edge.get("source_type"))
+        dst = self._node(edge["target_memory_id"], edge.get("target_type"))
+        self._type_code(edge["association_type"])
+        record = {
+            "id": edge.get("id"),
+            "source_memory_id": edge["source_memory_id"],
+            "target_memory_id": edge["target_memory_id"],
+            "association_type": edge["association_type"],
+            "strength": float(edge["strength"]),
+            "created_at": edge.get("created_at"),
+            "last_reinforced_at": reinforced_at,
+            "source_type": self.node_types[src],
+            "target_type": self.node_types[dst],
+            "reinforced": _timestamp(reinforced_at),
+            "alive": True,
+        }
+        self._overlay.append(record)
+        self._overlay_out.setdefault(src, []).append(len(self._overlay) - 1)
+        self._overlay_in.setdefault(dst, []).append(len(self._overlay) - 1)
+        if len(self._overlay) > GRAPH_OVERLAY_MAX_EDGES:
+            self.compact()
+
+    def remove_edge(self, source_id: UUID, target_id: UUID, association_type: str):
+        where, i = self._find(source_id, target_id, association_type)
+        if where == "base":
+            self.alive[i] = False
+        elif where == "overlay":
+            self._overlay[i]["alive"] = False
+
+    # ── bookkeeping ───────────────────────────────
+
+    @property
+    def edge_count(self) -> int:
+        return int(self.alive.sum()) + sum(1 for e in self._overlay if e["alive"])
+
+    def estimate_size(self) -> int:
+        arrays = (
+            self.src, self.dst, self.etype, self.strength, self.reinforced, self.alive,
+            self.out_order, self.out_indptr, self.in_order, self.in_indptr,
+        )
+        return (
+            sum(a.nbytes for a in arrays)
+            + len(self.node_ids) * _NODE_OVERHEAD_BYTES
+            + (len(self.edge_ids) + len(self._overlay)) * _EDGE_OVERHEAD_BYTES
+        )
+
+
+def personalized_pagerank(
+    n_nodes: int,
+    src: np.ndarray,
+    dst: np.ndarray,
+    weights: np.ndarray,
+    personalization: np.ndarray,
+    damping: float = PAGERANK_DAMPING,
+    tolerance: float = PAGERANK_TOLERANCE,
+    max_iterations: int = PAGERANK_MAX_ITERATIONS,
+) -> np.ndarray:
+    """
+    Weighted personalized PageRank by power iteration over an edge list.
+    Mass leaving a node is split across its out-edges in proportion to their
+    weights; mass of nodes without out-edges, and the (1 - damping) restart
+    share, return to the graph following the personalization vector.
+    Returns a probability vector over the n_nodes nodes.
+    """
+    if n_nodes == 0:
+        return np.zeros(0)
+    restart = np.asarray(personalization, dtype=np.float64)
+    restart = restart / restart.sum() if restart.sum() > 0 else np.full(n_nodes, 1.0 / n_nodes)
+
+    out_weight = np.bincount(src, weights=weights, minlength=n_nodes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        transition = np.where(out_weight[src] > 0, weights / out_weight[src], 0.0)
+    dangling = out_weight <= 0
+
+    rank = restart.copy()
+    for _ in range(max_iterations):
+        spread = np.bincount(dst, weights=rank[src] * transition, minlength=n_nodes)
+        updated = damping * (spread + rank[dangling].sum() * restart) + (1 - damping) * restart
+        converged = np.abs(updated - rank).sum() < tolerance
+        rank = updated
+        if converged:
+            break
+    return rank
+
+
+class AssociationGraphCache:
+    """Byte-budgeted LRU of per-user association graphs with lazy, coalesced loading."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._graphs: "OrderedDict[str, tuple[AssociationGraph, int]]" = OrderedDict()
+        self._oversized: dict[str, float] = {}  # user_id -> when its graph was found over budget
+        self._loads = SingleFlight()
+        self.size_bytes = 0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def peek(self, user_id: str) -> Optional[AssociationGraph]:
+        """The user's cached graph if loaded and fresh, without loading it."""
+        entry = self._graphs.get(user_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0].loaded_at > self.ttl_seconds:
+            self.invalidate(user_id)
+            return None
+        return entry[0]
+
+    def is_oversized(self, user_id: str) -> bool:
+        """
+        Whether the user's graph was recently found too large to cache; callers
+        should then query the database directly instead of loading it.
+        """
+        marked_at = self._oversized.get(user_id)
+        if marked_at is None:
+            return False
+        if time.monotonic() - marked_at > GRAPH_OVERSIZE_RECHECK_SECONDS:
+            del self._oversized[user_id]
+            return False
+        return True
+
+    async def get(self, user_id: str, loader: Callable[[], Awaitable[AssociationGraph]]) -> AssociationGraph:
+        """The user's graph, loading it with loader() on a miss (concurrent misses share one load)."""
+        graph = self.peek(user_id)
+        if graph is not None:
+            self._graphs.move_to_end(user_id)
+            self.hits += 1
+            return graph
+
+        async def load():
+            graph = await loader()
+            self.loads += 1
+            self._store(user_id, graph)
+            return graph
+
+        return await self._loads.do(user_id, load)
+
+    def _store(self, user_id: str, graph: AssociationGraph):
+        self.invalidate(user_id)
+        size = graph.estimate_size()
+        if size > self.max_bytes:
+            self._oversized[user_id] = time.monotonic()
+            logger.info(f"Association graph of user {user_id[:8]}... exceeds the cache budget ({size} bytes)")
+            return  # Served once, never cached
+        self._graphs[user_id] = (graph, size)
+        self.size_bytes += size
+        while self.size_bytes > self.max_bytes and self._graphs:
+            _, (_, evicted_size) = self._graphs.popitem(last=False)
+            self.size_bytes -= evicted_size
+            self.evictions += 1
+
+    def upsert_edge(self, user_id: str, edge: dict):
+        """Apply an association write to the user's cached graph, if loaded."""
+        entry = self._graphs.get(user_id)
+        if entry is None:
+            return
+        graph, size = entry
+        graph.upsert_edge(edge)
+        new_size = graph.estimate_size()
+        self._graphs[user_id] = (graph, new_size)
+        self.size_bytes += new_size - size
+
+    def remove_edge(self, user_id: str, source_id: UUID, target_id: UUID, association_type: str):
+        entry = self._graphs.get(user_id)
+        if entry is not None:
+            entry[0].remove_edge(source_id, target_id, association_type)
+
+    def invalidate(self, user_id: str):
+        entry = self._graphs.pop(user_id, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
+
+    def clear(self):
+        self._graphs.clear()
+        self._oversized.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._graphs),
+            "oversized_users": len(self._oversized),
+            "edges": sum(graph.edge_count for graph, _ in self._graphs.values()),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+association_graphs = AssociationGraphCache(GRAPH_CACHE_MAX_BYTES, GRAPH_CACHE_TTL_SECONDS)
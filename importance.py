@@ -0,0 +1,166 @@
+"""
+importance.py - Background Graph Importance (Personalized PageRank)
+Analogic Memory System for Omnira Synora AI
+
+Scores how central each memory is in its user's association graph and
+stores it in memory_entries.relevance_score (0..1, 1 = most central),
+where recall uses it as a ranking prior and as an ordering key.
+
+Every association write, memory delete or purge marks its owner in
+association_graph_dirty (see AnalogicCore.mark_graphs_dirty). A periodic
+task claims dirty users, rebuilds their graph as edge arrays and runs
+personalized PageRank by sparse power iteration, restarting at memories
+in proportion to how often they are accessed. Users whose graphs have not changed are never
+recomputed.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+import numpy as np
+
+from unit_of_work import get_connection, unit_of_work
+from graph_cache import personalized_pagerank
+from memory_engine import bump_memory_generations
+from analogic_core import AnalogicCore
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+IMPORTANCE_REFRESH_INTERVAL_SECONDS = float(os.getenv("IMPORTANCE_REFRESH_INTERVAL_SECONDS", "60"))
+IMPORTANCE_USERS_PER_RUN = int(os.getenv("IMPORTANCE_USERS_PER_RUN", "20"))
+IMPORTANCE_CLAIM_SECONDS = 600  # A claimed user is offered again after this (e.g. after a crash)
+IMPORTANCE_WRITE_CHUNK = 5000
+IMPORTANCE_MIN_CHANGE = 1e-3  # Smaller score changes are not written back
+
+
+async def refresh_user_importance(user_id: str, marked_at: Optional[datetime] = None) -> int:
+    """
+    Recompute and store one user's importance scores. Returns the number of rows updated.
+    With marked_at, the user's dirty marker is cleared in the same transaction
+    as the scores, unless the graph was marked again since.
+    """
+    async with get_connection() as conn:
+        nodes = await conn.fetch(
+            "SELECT id, access_count FROM memory_entries WHERE user_id = $1 AND is_active = TRUE",
+            user_id
+        )
+        edges = await conn.fetch(
+            f"""
+            SELECT ma.source_memory_id, ma.target_memory_id,
+                   {AnalogicCore.EFFECTIVE_STRENGTH_SQL.format(alias="ma.", rate="$2")} AS strength
+            FROM memory_associations ma
+            JOIN memory_entries me_s ON me_s.id = ma.source_memory_id
+            JOIN memory_entries me_t ON me_t.id = ma.target_memory_id
+            WHERE me_s.user_id = $1 AND me_t.user_id = $1
+              AND me_s.is_active AND me_t.is_active AND ma.strength > 0
+            """,
+            user_id, AnalogicCore.DECAY_RATE
+        )
+    if not nodes:
+        if marked_at is not None:
+            async with get_connection() as conn:
+                await _clear_marker(conn, user_id, marked_at)
+        return 0
+
+    index = {row["id"]: i for i, row in enumerate(nodes)}
+    src = np.fromiter((index[e["source_memory_id"]] for e in edges), dtype=np.int64, count=len(edges))
+    dst = np.fromiter((index[e["target_memory_id"]] for e in edges), dtype=np.int64, count=len(edges))
+    weights = np.fromiter((e["strength"] for e in edges), dtype=np.float64, count=len(edges))
+    # Restart at every memory, more often at the ones the user actually recalls
+    personalization = 1.0 + np.log1p(np.fromiter((row["access_count"] or 0 for row in nodes), dtype=np.float64))
+
+    rank = await asyncio.to_thread(personalized_pagerank, len(nodes), src, dst, weights, personalization)
+    scores = np.round(rank / rank.max(), 4) if rank.max() > 0 else rank
+
+    ids: list[UUID] = [row["id"] for row in nodes]
+    updated = 0
+    async with unit_of_work() as conn:
+        for start in range(0, len(ids), IMPORTANCE_WRITE_CHUNK):
+            result = await conn.execute(
+                """
+                UPDATE memory_entries AS me
+                SET relevance_score = u.score
+                FROM unnest($1::uuid[], $2::float8[]) AS u(id, score)
+                WHERE me.id = u.id
+                  AND abs(COALESCE(me.relevance_score, 0) - u.score) >= $3
+                """,
+                ids[start:start + IMPORTANCE_WRITE_CHUNK],
+                scores[start:start + IMPORTANCE_WRITE_CHUNK].tolist(),
+                IMPORTANCE_MIN_CHANGE,
+            )
+            updated += int(result.split()[-1])
+        if updated:
+            # Recall rankings use these scores; invalidate cached recall results
+            await bump_memory_generations(conn, [user_id])
+        if marked_at is not None:
+            await _clear_marker(conn, user_id, marked_at)
+    return updated
+
+
+async def _clear_marker(conn, user_id: str, marked_at: datetime):
+    await conn.execute(
+        "DELETE FROM association_graph_dirty WHERE user_id = $1 AND marked_at = $2",
+        user_id, marked_at
+    )
+
+
+async def refresh_dirty_users(limit: int = IMPORTANCE_USERS_PER_RUN) -> int:
+    """
+    Claim up to `limit` users whose association graph changed and recompute them.
+    A claim only leases the marker for IMPORTANCE_CLAIM_SECONDS; it is deleted
+    together with the new scores, and kept if the graph was marked again in
+    the meantime. A crash or shutdown mid-refresh leaves the marker in place,
+    so the user is picked up again once the lease expires.
+    Returns the number of users refreshed.
+    """
+    async with get_connection() as conn:
+        users = await conn.fetch(
+            """
+            UPDATE association_graph_dirty
+            SET claimed_until = NOW() + make_interval(secs => $2)
+            WHERE user_id IN (
+                SELECT user_id FROM association_graph_dirty
+                WHERE claimed_until IS NULL OR claimed_until < NOW()
+                ORDER BY marked_at
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING user_id, marked_at
+            """,
+            limit, float(IMPORTANCE_CLAIM_SECONDS)
+        )
+
+    refreshed = 0
+    for row in users:
+        user_id = row["user_id"]
+        try:
+            updated = await refresh_user_importance(user_id, row["marked_at"])
+            refreshed += 1
+            logger.debug(f"Importance refreshed for user {user_id[:8]}...: {updated} scores changed")
+        except Exception as e:
+            logger.warning(f"Importance refresh failed for user {user_id[:8]}...: {e}")
+            async with get_connection() as conn:
+                await conn.execute(
+                    "UPDATE association_graph_dirty SET claimed_until = NULL WHERE user_id = $1",
+                    user_id
+                )
+    return refreshed
+
+
+async def run_importance_refresh():
+    """Background task: keep importance scores of changed graphs up to date."""
+    while True:
+        try:
+            refreshed = await refresh_dirty_users()
+            if refreshed:
+                logger.info(f"Importance scores refreshed for {refreshed} users.")
+        except Exception as e:
+            logger.warning(f"Importance refresh error: {e}")
+            refreshed = 0
+        if refreshed < IMPORTANCE_USERS_PER_RUN:
+            await asyncio.sleep(IMPORTANCE_REFRESH_INTERVAL_SECONDS)
@@ -22,9 +22,13 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 
 from database import init_database, close_pool
+from migrations import apply_migrations
 from memory_router import router
 from backup_system import schedule_backups
-from memory_engine import MemoryEngine
+from association_queue import run_association_workers
+from memory_engine import MemoryEngine, access_counters
+from importance import run_importance_refresh
+from analogic_core import AnalogicCore
 
 # ─────────────────────────────────────────────
 # LOGGING
@@ -36,6 +40,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+ASSOCIATION_SWEEP_INTERVAL_SECONDS = float(os.getenv("ASSOCIATION_SWEEP_INTERVAL_SECONDS", "3600"))
+
 
 # ─────────────────────────────────────────────
 # APP LIFECYCLE
@@ -47,21 +53,53 @@ async def lifespan(app: FastAPI):
 
     # Initialize database schema
     await init_database()
+    await apply_migrations()
     logger.info("✅ Database initialized.")
 
     # Start scheduled backup task
     backup_task = asyncio.create_task(schedule_backups())
     logger.info("✅ Backup scheduler started.")
 
+    # Start background auto-association workers
+    association_task = asyncio.create_task(run_association_workers())
+    logger.info("✅ Association workers started.")
+
     # Start memory cleanup task (purge expired short-term memories hourly)
     cleanup_task = asyncio.create_task(periodic_cleanup())
     logger.info("✅ Memory cleanup scheduler started.")
 
+    # Start background re-encryption of memories under legacy key schemes
+    key_migration_task = asyncio.create_task(periodic_key_migration())
+    logger.info("✅ Key migration scheduler started.")
+
+    # Start write-behind flushing of recall access counts
+    access_flush_task = asyncio.create_task(access_counters.run())
+    logger.info("✅ Access count flusher started.")
+
+    # Start incremental recomputation of graph importance scores
+    importance_task = asyncio.create_task(run_importance_refresh())
+    logger.info("✅ Importance refresher started.")
+
+    # Start pruning of associations decayed below the strength threshold
+    association_sweep_task = asyncio.create_task(periodic_association_sweep())
+    logger.info("✅ Association decay sweeper started.")
+
     yield
 
     # Shutdown
     backup_task.cancel()
+    association_task.cancel()
     cleanup_task.cancel()
+    key_migration_task.cancel()
+    access_flush_task.cancel()
+    importance_task.cancel()
+    association_sweep_task.cancel()
+    # Let an interrupted flush put its batch back before the final flush
+    await asyncio.gather(access_flush_task, return_exceptions=True)
+    try:
+        await access_counters.flush()
+    except Exception as e:
+        logger.warning(f"Final access count flush failed: {e}")
     await close_pool()
     logger.info("🛑 Analogic Memory System shut down cleanly.")
 
@@ -79,6 +117,28 @@ async def periodic_cleanup():
         await asyncio.sleep(3600)
 
 
+async def periodic_association_sweep():
+    """Prune associations whose strength has decayed below the threshold, hourly."""
+    analogic = AnalogicCore()
+    while True:
+        try:
+            await analogic.decay_weak_associations()
+        except Exception as e:
+            logger.warning(f"Association sweep error: {e}")
+        await asyncio.sleep(ASSOCIATION_SWEEP_INTERVAL_SECONDS)
+
+
+async def periodic_key_migration():
+    """Re-encrypt and index legacy memories at startup, then hourly (e.g. after restores)."""
+    engine = MemoryEngine()
+    while True:
+        try:
+            await engine.migrate_legacy_memories()
+        except Exception as e:
+            logger.warning(f"Key migration task error: {e}")
+        await asyncio.sleep(3600)
+
+
 # ─────────────────────────────────────────────
 # FASTAPI APP
 # ─────────────────────────────────────────────
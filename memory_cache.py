@@ -0,0 +1,217 @@
+"""
+memory_cache.py - In-Process Memory Caches
+Analogic Memory System for Omnira Synora AI
+
+WorkingSetCache keeps recently used, already decrypted memory records of
+active users in process memory so repeated recalls and lookups skip
+fetching and decrypting their ciphertext. Memory content is immutable
+once stored, so entries only ever need to be dropped (delete / purge /
+restore), never updated. Candidate selection and counters still come
+from PostgreSQL.
+
+RecallResultCache keeps complete recall results for a short TTL, tagged
+with the user's memory generation (memory_corpus_stats.generation, bumped
+in the same transaction as every store / delete / purge / restore).
+A result is only served while the generation still matches, so a change
+made through any worker invalidates it immediately.
+
+Both are used only from the event loop thread; no locking is required.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MEMORY_CACHE_MAX_BYTES = int(os.getenv("MEMORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RECALL_CACHE_TTL_SECONDS = float(os.getenv("RECALL_CACHE_TTL_SECONDS", "10"))
+RECALL_CACHE_MAX_ENTRIES = int(os.getenv("RECALL_CACHE_MAX_ENTRIES", "2048"))
+
+_RECORD_OVERHEAD_BYTES = 512  # dict, ids, metadata
+_TERM_OVERHEAD_BYTES = 56     # per cached term string
+
+
+class WorkingSetCache:
+    """
+    Byte-budgeted, two-level LRU: users are ordered by last use and each
+    user's records by last use. When over budget, the least recently used
+    record of the least recently used user is evicted first.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._users: "OrderedDict[str, OrderedDict[str, tuple[dict, int]]]" = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _estimate_size(record: dict) -> int:
+        content = record.get("content") or ""
+        terms = record.get("terms") or ()
+        return (
+            len(content.encode("utf-8"))
+            + sum(len(t) + _TERM_OVERHEAD_BYTES for t in terms)
+            + _RECORD_OVERHEAD_BYTES
+        )
+
+    def get(self, user_id: str, memory_id: str) -> Optional[dict]:
+        records = self._users.get(user_id)
+        entry = records.get(memory_id) if records is not None else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._users.move_to_end(user_id)
+        records.move_to_end(memory_id)
+        self.hits += 1
+        return entry[0]
+
+    def get_many(self, user_id: str, memory_ids: list[str]) -> dict[str, dict]:
+        """Cached records among memory_ids, keyed by id."""
+        found = {}
+        for memory_id in memory_ids:
+            record = self.get(user_id, memory_id)
+            if record is not None:
+                found[memory_id] = record
+        return found
+
+    def put(self, user_id: str, record: dict):
+        """
+        Cache a decrypted record. It must contain "id" and "content", and may
+        carry derived data such as "terms" (the tokenized content).
+        """
+        if self.max_bytes <= 0:
+            return
+        size = self._estimate_size(record)
+        if size > self.max_bytes:
+            return
+        memory_id = record["id"]
+        self.invalidate(user_id, memory_id)
+        records = self._users.setdefault(user_id, OrderedDict())
+        records[memory_id] = (record, size)
+        self._users.move_to_end(user_id)
+        self.size_bytes += size
+        self._evict_to_budget()
+
+    def invalidate(self, user_id: str, memory_id: str):
+        records = self._users.get(user_id)
+        if records is None or memory_id not in records:
+            return
+        _, size = records.pop(memory_id)
+        self.size_bytes -= size
+        if not records:
+            del self._users[user_id]
+
+    def invalidate_user(self, user_id: str):
+        records = self._users.pop(user_id, None)
+        if records:
+            self.size_bytes -= sum(size for _, size in records.values())
+
+    def clear(self):
+        self._users.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._users),
+            "records": sum(len(records) for records in self._users.values()),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def _evict_to_budget(self):
+        while self.size_bytes > self.max_bytes and self._users:
+            user_id, records = next(iter(self._users.items()))
+            _, (_, size) = records.popitem(last=False)
+            self.size_bytes -= size
+            self.evictions += 1
+            if not records:
+                del self._users[user_id]
+
+
+working_set = WorkingSetCache(MEMORY_CACHE_MAX_BYTES)
+
+
+class RecallResultCache:
+    """
+    Short-TTL LRU of recall results keyed by a normalized request fingerprint.
+    Entries are tagged with the user's generation at computation time and
+    never expire later than the earliest expires_at among their memories.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[int, float, list[dict]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    @staticmethod
+    def fingerprint(user_id: str, query_terms: list[str], **filters) -> str:
+        """Stable key for a recall request; query_terms must already be normalized."""
+        payload = json.dumps(
+            {"user_id": user_id, "query_terms": list(query_terms), **filters},
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, generation: int) -> Optional[list[dict]]:
+        """Cached results (as fresh copies) if still valid for this generation."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        cached_generation, expires_at, results = entry
+        if cached_generation != generation or expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stale += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return [dict(r) for r in results]
+
+    def put(self, key: str, generation: int, results: list[dict], valid_until: Optional[datetime] = None):
+        """
+        Cache results computed at `generation`. valid_until is the earliest
+        expiry among the returned memories, if any.
+        """
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        ttl = self.ttl_seconds
+        if valid_until is not None:
+            ttl = min(ttl, valid_until.timestamp() - time.time())
+            if ttl <= 0:
+                return
+        self._entries[key] = (generation, time.monotonic() + ttl, [dict(r) for r in results])
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_evictions": self.stale,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+recall_cache = RecallResultCache(RECALL_CACHE_TTL_SECONDS, RECALL_CACHE_MAX_ENTRIES)
@@ -6,22 +6,188 @@ Handles CRUD operations for memory entries, context sessions,
 and intelligent memory recall based on context.
 """
 
+import asyncio
+import base64
 import json
 import logging
+import os
 from datetime import datetime, timedelta, timezone
-from typing import Optional
-from uuid import UUID
+from functools import partial
+from typing import AsyncIterator, Optional
+from uuid import UUID, uuid4
 
-from database import get_connection
+import numpy as np
+
+from database import get_connection as pool_connection
+from unit_of_work import after_commit, get_connection, in_unit_of_work, unit_of_work
 from security import (
     encrypt_with_user_key, decrypt_with_user_key,
-    hash_content, sanitize_input
+    encrypt_many_with_user_key, decrypt_many_with_user_key,
+    blind_index_tokens,
+    hash_content, sanitize_input, CURRENT_KEY_VERSION
 )
 from analogic_core import AnalogicCore
+from association_queue import association_queue
+from memory_cache import recall_cache, working_set
+from graph_cache import association_graphs
+from ranking import BM25Scorer, best_snippets, distinct_terms, tokenize, top_k_indices
+from singleflight import read_flights
 
 logger = logging.getLogger(__name__)
 analogic = AnalogicCore()
 
+# Write-behind access counting (see AccessCounterBuffer)
+ACCESS_FLUSH_INTERVAL_SECONDS = float(os.getenv("ACCESS_FLUSH_INTERVAL_SECONDS", "5"))
+ACCESS_BUFFER_MAX_SIZE = int(os.getenv("ACCESS_BUFFER_MAX_SIZE", "10000"))
+
+# Statement fragment that subtracts the rows of a preceding CTE named
+# `released` (user_id, keyword_tokens, term_count) from the BM25 corpus stats
+# and bumps the affected users' memory generation.
+RELEASE_CORPUS_STATS_CTES = """
+    released_corpus AS (
+        UPDATE memory_corpus_stats AS cs
+        SET doc_count = cs.doc_count - r.docs,
+            total_terms = cs.total_terms - r.terms,
+            generation = cs.generation + 1
+        FROM (SELECT user_id, COUNT(*) AS docs, SUM(term_count) AS terms
+              FROM released GROUP BY user_id) AS r
+        WHERE cs.user_id = r.user_id
+    ),
+    released_terms AS (
+        UPDATE memory_term_stats AS ts
+        SET doc_freq = ts.doc_freq - r.docs
+        FROM (SELECT user_id, t.term_token, COUNT(*) AS docs
+              FROM released, unnest(keyword_tokens) AS t(term_token)
+              GROUP BY user_id, t.term_token) AS r
+        WHERE ts.user_id = r.user_id AND ts.term_token = r.term_token
+    )
+"""
+
+
+async def bump_memory_generations(conn, user_ids):
+    """
+    Advance the memory generation of each user, invalidating their cached
+    recall results in every worker. Call inside the transaction that changes
+    the users' memories.
+    """
+    await conn.execute(
+        """
+        INSERT INTO memory_corpus_stats (user_id, generation)
+        SELECT user_id, 1 FROM unnest($1::text[]) AS u(user_id) ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET generation = memory_corpus_stats.generation + 1
+        """,
+        sorted(set(user_ids))
+    )
+
+
+def encode_list_cursor(created_at: str, memory_id: str) -> str:
+    """Opaque list cursor for the position after a memory (created_at in ISO format)."""
+    return base64.urlsafe_b64encode(json.dumps([created_at, memory_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_list_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Inverse of encode_list_cursor. Raises ValueError for a malformed cursor."""
+    try:
+        created_at, memory_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), UUID(memory_id)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise ValueError("Invalid list cursor.") from e
+
+
+class AccessCounterBuffer:
+    """
+    Write-behind buffer for memory access counts.
+    Recalls record increments in process; they are aggregated per memory id and
+    written in a single UPDATE periodically, when the buffer reaches its size
+    limit, and on shutdown. Keeps the recall path free of writes and row locks.
+    While flushes fail (e.g. the database is down), at most
+    OVERFLOW_FACTOR * max_size memories are tracked; accesses to further
+    memories are dropped and counted.
+    """
+
+    OVERFLOW_FACTOR = 4
+
+    def __init__(self, flush_interval: float, max_size: int):
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._pending: dict[UUID, int] = {}
+        self._flush_lock = asyncio.Lock()
+        self._early_flush: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flushed_increments = 0
+        self.dropped_increments = 0
+
+    def _add(self, memory_id: UUID, hits: int):
+        if memory_id in self._pending:
+            self._pending[memory_id] += hits
+        elif len(self._pending) < self.max_size * self.OVERFLOW_FACTOR:
+            self._pending[memory_id] = hits
+        else:
+            self.dropped_increments += hits
+
+    def record(self, memory_ids: list[UUID]):
+        """Buffer one access for each memory id."""
+        for memory_id in memory_ids:
+            self._add(memory_id, 1)
+        if len(self._pending) >= self.max_size and (self._early_flush is None or self._early_flush.done()):
+            self._early_flush = asyncio.create_task(self._flush_quietly())
+
+    async def flush(self) -> int:
+        """Write all buffered increments. Returns the number of memories updated."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            # A stable order keeps concurrent flushes from other workers lock-compatible
+            ids = sorted(pending, key=lambda memory_id: memory_id.bytes)
+            try:
+                # Always a fresh pooled connection: flushes may be triggered from
+                # inside a request's unit of work but must not join it.
+                async with pool_connection() as conn:
+                    await conn.execute(
+                        """
+                        UPDATE memory_entries AS me
+                        SET access_count = me.access_count + v.hits, updated_at = NOW()
+                        FROM unnest($1::uuid[], $2::int[]) AS v(id, hits)
+                        WHERE me.id = v.id
+                        """,
+                        ids, [pending[memory_id] for memory_id in ids]
+                    )
+            except BaseException:
+                # Put the increments back so the next flush retries them (also
+                # when cancelled at shutdown, before the final flush)
+                for memory_id, hits in pending.items():
+                    self._add(memory_id, hits)
+                raise
+            self.flushes += 1
+            self.flushed_increments += sum(pending.values())
+            return len(ids)
+
+    async def run(self):
+        """Background task: flush buffered increments every flush_interval seconds."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_quietly()
+
+    def stats(self) -> dict:
+        return {
+            "pending_memories": len(self._pending),
+            "max_size": self.max_size,
+            "flush_interval_seconds": self.flush_interval,
+            "flushes": self.flushes,
+            "flushed_increments": self.flushed_increments,
+            "dropped_increments": self.dropped_increments,
+        }
+
+    async def _flush_quietly(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Access count flush failed: {e}")
+
+
+access_counters = AccessCounterBuffer(ACCESS_FLUSH_INTERVAL_SECONDS, ACCESS_BUFFER_MAX_SIZE)
+
 
 class MemoryEngine:
     """
@@ -32,6 +198,17 @@ class MemoryEngine:
     SHORT_TERM_TTL_HOURS = 24       # Short-term memory expires in 24h
     MAX_CONTENT_LENGTH = 50_000     # 50KB per memory entry
     DEFAULT_RECALL_LIMIT = 20
+    MAX_BATCH_STORE_ITEMS = 1000
+    _BATCH_COLUMNS = (
+        "id", "user_id", "session_id", "memory_type", "scope", "content_encrypted",
+        "content_hash", "tags", "expires_at", "key_version", "keyword_tokens",
+        "term_count", "association_status",
+    )
+    RECALL_CANDIDATE_MULTIPLIER = 3  # Candidates fetched per requested result
+    RECALL_MATCH_SCAN_LIMIT = 5000  # Keyword matches ranked per query (rarest terms first)
+    MAX_BATCH_RECALL_QUERIES = 10
+    LIST_CHUNK_SIZE = 200  # Rows fetched (and decrypted) per listing query
+    KEY_MIGRATION_BATCH_SIZE = 500
 
     # ─────────────────────────────────────────────
     # STORE MEMORY
@@ -49,7 +226,10 @@ class MemoryEngine:
     ) -> dict:
         """
         Store a new memory entry with AES-256-GCM encryption.
-        Returns the stored memory metadata (without decrypted content).
+        The insert, corpus statistics and the queued auto-association job (or
+        the associations themselves, when workers are disabled) commit
+        atomically in one unit of work. Returns the stored memory metadata
+        (without decrypted content).
         """
         content = sanitize_input(content, max_length=self.MAX_CONTENT_LENGTH)
         user_id = sanitize_input(user_id, max_length=255)
@@ -63,40 +243,234 @@ class MemoryEngine:
 
         content_encrypted = encrypt_with_user_key(content, user_id)
         content_hash = hash_content(content)
+        terms = tokenize(content)
+        keyword_tokens = blind_index_tokens(list(dict.fromkeys(terms)), user_id)
+        association_status = None
+        if tags:
+            association_status = "pending" if association_queue.enabled else "done"
 
-        async with get_connection() as conn:
-            # Prevent exact duplicate entries
-            existing = await conn.fetchval(
-                "SELECT id FROM memory_entries WHERE user_id = $1 AND content_hash = $2 AND is_active = TRUE",
-                user_id, content_hash
-            )
-            if existing:
-                logger.info(f"Duplicate memory skipped for user {user_id[:8]}...")
-                return {"id": str(existing), "status": "duplicate", "message": "Memory already exists."}
-
+        async with unit_of_work() as conn:
+            # Insert unless an active duplicate exists (enforced by a unique partial index)
             row = await conn.fetchrow(
                 """
                 INSERT INTO memory_entries
-                    (user_id, session_id, memory_type, scope, content_encrypted, content_hash, tags, expires_at)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                RETURNING id, user_id, memory_type, scope, tags, created_at, expires_at
+                    (user_id, session_id, memory_type, scope, content_encrypted, content_hash, tags, expires_at,
+                     key_version, keyword_tokens, term_count, association_status)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+                ON CONFLICT (user_id, content_hash) WHERE is_active DO NOTHING
+                RETURNING id, user_id, memory_type, scope, tags, created_at, expires_at, association_status
                 """,
                 user_id, session_id, memory_type, scope,
-                content_encrypted, content_hash, tags, expires_at
+                content_encrypted, content_hash, tags, expires_at, CURRENT_KEY_VERSION,
+                keyword_tokens, len(terms), association_status
+            )
+            if row is None:
+                existing = await conn.fetchval(
+                    "SELECT id FROM memory_entries WHERE user_id = $1 AND content_hash = $2 AND is_active = TRUE",
+                    user_id, content_hash
+                )
+                logger.info(f"Duplicate memory skipped for user {user_id[:8]}...")
+                return {"id": str(existing), "status": "duplicate", "message": "Memory already exists."}
+            await self._apply_corpus_delta(
+                conn, user_id, 1, len(terms), {token: 1 for token in keyword_tokens}
             )
 
-        memory_id = row["id"]
-        result = dict(row)
-        result["id"] = str(memory_id)
+            memory_id = row["id"]
+            result = dict(row)
+            result["id"] = str(memory_id)
 
-        # Auto-associate with related memories
-        if tags:
-            associations_created = await analogic.auto_associate(memory_id, user_id, content, tags)
-            result["associations_created"] = associations_created
+            # Auto-associate with related memories (in the background when workers run)
+            if tags and association_queue.enabled:
+                await association_queue.enqueue(memory_id, user_id, tags)
+            elif tags:
+                associations_created = await analogic.auto_associate(memory_id, user_id, content, tags)
+                result["associations_created"] = associations_created
+
+        self._cache_record(user_id, dict(row, access_count=0), content)
 
         logger.info(f"Memory stored: {memory_id} | user={user_id[:8]}... | type={memory_type}")
         return result
 
+    async def store_memories_batch(self, items: list[dict]) -> list[dict]:
+        """
+        Store many memories at once (e.g. importing an agent's history).
+        Each item takes the same fields as store_memory. Encryption runs once per
+        user; rows are COPYed into a staging table and inserted with one
+        ON CONFLICT DO NOTHING statement, all in one unit of work.
+        Returns one status entry per item, in input order.
+        """
+        if len(items) > self.MAX_BATCH_STORE_ITEMS:
+            raise ValueError(f"Batch exceeds maximum of {self.MAX_BATCH_STORE_ITEMS} memories.")
+
+        now = datetime.now(timezone.utc)
+        results: list[dict] = [{"index": i} for i in range(len(items))]
+        accepted: list[dict] = []
+        first_by_key: dict[tuple[str, str], dict] = {}
+
+        for i, item in enumerate(items):
+            try:
+                content = sanitize_input(item["content"], max_length=self.MAX_CONTENT_LENGTH)
+                user_id = sanitize_input(item["user_id"], max_length=255)
+            except (KeyError, ValueError) as e:
+                results[i].update({"status": "error", "error": str(e)})
+                continue
+
+            content_hash = hash_content(content)
+            first = first_by_key.get((user_id, content_hash))
+            if first is not None:
+                results[i].update({"status": "duplicate", "duplicate_of": first["index"]})
+                continue
+
+            scope = item.get("scope") or "long_term"
+            expires_at = None
+            if scope == "short_term":
+                hours = item.get("ttl_hours") or self.SHORT_TERM_TTL_HOURS
+                expires_at = now + timedelta(hours=hours)
+            terms = tokenize(content)
+            entry = {
+                "index": i,
+                "user_id": user_id,
+                "content": content,
+                "content_hash": content_hash,
+                "memory_type": item.get("memory_type") or "general",
+                "scope": scope,
+                "session_id": item.get("session_id"),
+                "tags": item.get("tags") or [],
+                "expires_at": expires_at,
+                "term_count": len(terms),
+                "keyword_tokens": blind_index_tokens(list(dict.fromkeys(terms)), user_id),
+            }
+            first_by_key[(user_id, content_hash)] = entry
+            accepted.append(entry)
+
+        if not accepted:
+            return self._resolve_batch_duplicates(results)
+
+        # One key lookup and one (parallelized) encryption pass per user
+        by_user: dict[str, list[dict]] = {}
+        for entry in accepted:
+            by_user.setdefault(entry["user_id"], []).append(entry)
+        for user_id, entries in by_user.items():
+            encrypted = await asyncio.to_thread(
+                encrypt_many_with_user_key, [e["content"] for e in entries], user_id
+            )
+            for entry, blob in zip(entries, encrypted):
+                entry["content_encrypted"] = blob
+
+        async with unit_of_work() as conn:
+            candidates = []
+            for entry in accepted:
+                if isinstance(entry["content_encrypted"], Exception):
+                    results[entry["index"]].update({"status": "error", "error": "Encryption failed."})
+                    logger.error(f"Batch store encryption failed: {entry['content_encrypted']}")
+                    continue
+                entry["id"] = uuid4()
+                if entry["tags"]:
+                    entry["association_status"] = "pending" if association_queue.enabled else "done"
+                else:
+                    entry["association_status"] = None
+                candidates.append(entry)
+
+            new_entries = []
+            if candidates:
+                # COPY into a staging table, then insert skipping active duplicates in one statement.
+                # The table lives until the unit of work ends, so later batches in it reuse it.
+                await conn.execute(
+                    """
+                    CREATE TEMP TABLE IF NOT EXISTS memory_entries_staging
+                        (LIKE memory_entries INCLUDING DEFAULTS)
+                        ON COMMIT DROP
+                    """
+                )
+                await conn.execute("TRUNCATE memory_entries_staging")
+                await conn.copy_records_to_table(
+                    "memory_entries_staging",
+                    columns=list(self._BATCH_COLUMNS),
+                    records=[
+                        (
+                            e["id"], e["user_id"], e["session_id"], e["memory_type"], e["scope"],
+                            e["content_encrypted"], e["content_hash"], e["tags"], e["expires_at"],
+                            CURRENT_KEY_VERSION, e["keyword_tokens"], e["term_count"], e["association_status"],
+                        )
+                        for e in candidates
+                    ],
+                )
+                columns = ", ".join(self._BATCH_COLUMNS)
+                inserted_rows = await conn.fetch(
+                    f"""
+                    INSERT INTO memory_entries ({columns})
+                    SELECT {columns} FROM memory_entries_staging
+                    ON CONFLICT (user_id, content_hash) WHERE is_active DO NOTHING
+                    RETURNING id
+                    """
+                )
+                inserted = {r["id"] for r in inserted_rows}
+                new_entries = [e for e in candidates if e["id"] in inserted]
+
+                skipped = [e for e in candidates if e["id"] not in inserted]
+                if skipped:
+                    existing_rows = await conn.fetch(
+                        """
+                        SELECT id, user_id, content_hash FROM memory_entries
+                        WHERE user_id = ANY($1) AND content_hash = ANY($2) AND is_active = TRUE
+                        """,
+                        list({e["user_id"] for e in skipped}), [e["content_hash"] for e in skipped]
+                    )
+                    existing = {(r["user_id"], r["content_hash"]): r["id"] for r in existing_rows}
+                    for e in skipped:
+                        existing_id = existing.get((e["user_id"], e["content_hash"]))
+                        results[e["index"]].update({
+                            "status": "duplicate",
+                            "id": str(existing_id) if existing_id else None,
+                        })
+
+            if new_entries:
+                # Take the users' corpus-stat row locks in a fixed order, like bump_memory_generations
+                for user_id in sorted(by_user):
+                    user_entries = [e for e in new_entries if e["user_id"] == user_id]
+                    if not user_entries:
+                        continue
+                    token_deltas: dict[str, int] = {}
+                    for e in user_entries:
+                        for token in e["keyword_tokens"]:
+                            token_deltas[token] = token_deltas.get(token, 0) + 1
+                    await self._apply_corpus_delta(
+                        conn, user_id, len(user_entries), sum(e["term_count"] for e in user_entries), token_deltas
+                    )
+
+                tagged = [e for e in new_entries if e["tags"]]
+                if tagged and association_queue.enabled:
+                    await conn.copy_records_to_table(
+                        "association_jobs",
+                        columns=["memory_id", "user_id", "tags"],
+                        records=[(e["id"], e["user_id"], e["tags"]) for e in tagged],
+                    )
+                else:
+                    for e in tagged:
+                        await analogic.auto_associate(e["id"], e["user_id"], e["content"], e["tags"])
+
+            for e in new_entries:
+                results[e["index"]].update({
+                    "status": "stored",
+                    "id": str(e["id"]),
+                    "association_status": e["association_status"],
+                })
+
+        for e in new_entries:
+            self._cache_record(e["user_id"], dict(e, access_count=0, created_at=now), e["content"])
+
+        logger.info(f"Batch store: {len(new_entries)} of {len(items)} memories stored.")
+        return self._resolve_batch_duplicates(results)
+
+    @staticmethod
+    def _resolve_batch_duplicates(results: list[dict]) -> list[dict]:
+        """Point in-batch duplicates at the id their first occurrence resolved to."""
+        for result in results:
+            if "duplicate_of" in result:
+                original = results[result.pop("duplicate_of")]
+                result["id"] = original.get("id")
+        return results
+
     # ─────────────────────────────────────────────
     # RECALL MEMORY
     # ─────────────────────────────────────────────
@@ -110,146 +484,913 @@ class MemoryEngine:
         session_id: Optional[str] = None,
         tags: Optional[list[str]] = None,
         limit: int = DEFAULT_RECALL_LIMIT,
+        include_content: bool = True,
+        snippet_chars: Optional[int] = None,
+        snippet_windows: int = 1,
+        record_access: bool = True,
     ) -> list[dict]:
         """
         Retrieve and rank memories relevant to a given query context.
-        Returns decrypted, relevance-scored memories.
+        Returns decrypted, relevance-scored memories. Results are served from
+        the recall cache while the user's memory generation is unchanged, and
+        concurrent identical recalls share one execution.
+        Without content, nothing is decrypted: memories are ranked from their
+        blind keyword index (term presence instead of term frequency).
+        With snippet_chars, each result carries "snippets" - up to snippet_windows
+        passages around query term hits, snippet_chars in total - instead of content.
         """
-        query_keywords = query.lower().split()
-        now = datetime.now(timezone.utc)
+        query_terms = distinct_terms(query)
+        # Ranking depends on the query only through its distinct terms
+        cache_key = self._recall_cache_key(
+            user_id, query_terms, memory_type, scope, session_id, tags, limit, include_content,
+            snippet_chars, snippet_windows
+        )
+        snippets = (snippet_chars, snippet_windows) if snippet_chars and include_content else None
+
+        def execute():
+            return self._recall(
+                user_id, query_terms, cache_key, memory_type, scope, session_id, tags, limit,
+                include_content, snippets
+            )
+
+        if in_unit_of_work():
+            # May depend on the unit of work's uncommitted writes; never shared
+            results = await execute()
+        else:
+            results = [dict(r) for r in await read_flights.do(("recall", cache_key), execute)]
+
+        if record_access:
+            # Increment access count for recalled memories (written behind, in batches)
+            access_counters.record([UUID(r["id"]) for r in results])
+        return results
+
+    async def _recall(
+        self,
+        user_id: str,
+        query_terms: list[str],
+        cache_key: str,
+        memory_type: Optional[str],
+        scope: Optional[str],
+        session_id: Optional[str],
+        tags: Optional[list[str]],
+        limit: int,
+        include_content: bool = True,
+        snippets: Optional[tuple[int, int]] = None,
+    ) -> list[dict]:
+        """Candidate fetch, decryption and ranking behind recall_memory."""
+        query_tokens = blind_index_tokens(query_terms, user_id)
+        window = limit * self.RECALL_CANDIDATE_MULTIPLIER
+        where_clause, params = self._recall_filters(user_id, memory_type, scope, session_id, tags)
+
+        async with get_connection() as conn:
+            # Results computed inside an open transaction may see uncommitted writes
+            cacheable = not conn.is_in_transaction()
+            generation = await self._memory_generation(conn, user_id)
+            cached_results = recall_cache.get(cache_key, generation) if cacheable else None
+            if cached_results is not None:
+                return cached_results
+
+            corpus = await self._load_corpus_stats(conn, user_id, query_tokens)
+            rows = await self._fetch_candidates(
+                conn, user_id, where_clause, params, [query_tokens], [window], corpus[2], include_content
+            )
+            if include_content:
+                records, ciphertexts = await self._split_cached(conn, user_id, rows)
+
+        if include_content:
+            records.update(await self._decrypt_records(user_id, rows, ciphertexts))
+        else:
+            records = {str(row["id"]): self._index_record(row) for row in rows}
+        candidates = [(row, records[str(row["id"])]) for row in rows if str(row["id"]) in records]
+        features = self._candidate_features(candidates)
+        results, valid_until = self._rank(
+            self._bm25_scorer(corpus, query_terms, query_tokens), query_tokens, candidates, features, limit,
+            snippets
+        )
+
+        if cacheable:
+            recall_cache.put(cache_key, generation, results, valid_until)
+        return results
+
+    async def recall_memories_batch(
+        self,
+        user_id: str,
+        queries: list[dict],
+        memory_type: Optional[str] = None,
+        scope: Optional[str] = None,
+        session_id: Optional[str] = None,
+        tags: Optional[list[str]] = None,
+    ) -> list[list[dict]]:
+        """
+        Recall for several queries ({"query", "limit"}) of one user under shared
+        filters. The union of the queries' candidates is fetched and decrypted
+        once, then ranked against each query. Returns one result list per query,
+        in input order; each query is also looked up in / added to the recall cache.
+        """
+        if len(queries) > self.MAX_BATCH_RECALL_QUERIES:
+            raise ValueError(f"Batch exceeds maximum of {self.MAX_BATCH_RECALL_QUERIES} queries.")
+
+        plans = []
+        for q in queries:
+            query_terms = distinct_terms(q["query"])
+            limit = q.get("limit") or self.DEFAULT_RECALL_LIMIT
+            plans.append({
+                "terms": query_terms,
+                "tokens": blind_index_tokens(query_terms, user_id),
+                "limit": limit,
+                "cache_key": self._recall_cache_key(
+                    user_id, query_terms, memory_type, scope, session_id, tags, limit, True
+                ),
+            })
+        where_clause, params = self._recall_filters(user_id, memory_type, scope, session_id, tags)
+        results: list[Optional[list[dict]]] = [None] * len(plans)
 
         async with get_connection() as conn:
-            conditions = [
-                "user_id = $1",
-                "is_active = TRUE",
-                "(expires_at IS NULL OR expires_at > NOW())"
-            ]
-            params: list = [user_id]
-            param_idx = 2
-
-            if memory_type:
-                conditions.append(f"memory_type = ${param_idx}")
-                params.append(memory_type)
-                param_idx += 1
-
-            if scope:
-                conditions.append(f"scope = ${param_idx}")
-                params.append(scope)
-                param_idx += 1
-
-            if session_id:
-                conditions.append(f"session_id = ${param_idx}")
-                params.append(session_id)
-                param_idx += 1
-
-            if tags:
-                conditions.append(f"tags && ${param_idx}")
-                params.append(tags)
-                param_idx += 1
-
-            where_clause = " AND ".join(conditions)
+            cacheable = not conn.is_in_transaction()
+            generation = await self._memory_generation(conn, user_id)
+            if cacheable:
+                for i, plan in enumerate(plans):
+                    results[i] = recall_cache.get(plan["cache_key"], generation)
+            pending = [i for i, r in enumerate(results) if r is None]
+
+            if pending:
+                corpus = await self._load_corpus_stats(
+                    conn, user_id, list({t for i in pending for t in plans[i]["tokens"]})
+                )
+                rows = await self._fetch_candidates(
+                    conn, user_id, where_clause, params,
+                    [plans[i]["tokens"] for i in pending],
+                    [plans[i]["limit"] * self.RECALL_CANDIDATE_MULTIPLIER for i in pending],
+                    corpus[2],
+                )
+                records, ciphertexts = await self._split_cached(conn, user_id, rows)
+
+        if pending:
+            records.update(await self._decrypt_records(user_id, rows, ciphertexts))
+            candidates = [(row, records[str(row["id"])]) for row in rows if str(row["id"]) in records]
+            features = self._candidate_features(candidates)
+            for i in pending:
+                plan = plans[i]
+                scorer = self._bm25_scorer(corpus, plan["terms"], plan["tokens"])
+                results[i], valid_until = self._rank(scorer, plan["tokens"], candidates, features, plan["limit"])
+                if cacheable:
+                    recall_cache.put(plan["cache_key"], generation, results[i], valid_until)
+
+        access_counters.record(list({UUID(r["id"]) for result in results for r in result}))
+        return results
+
+    @staticmethod
+    def _recall_cache_key(
+        user_id: str,
+        query_terms: list[str],
+        memory_type: Optional[str],
+        scope: Optional[str],
+        session_id: Optional[str],
+        tags: Optional[list[str]],
+        limit: int,
+        include_content: bool,
+        snippet_chars: Optional[int] = None,
+        snippet_windows: int = 1,
+    ) -> str:
+        """Recall cache and single-flight key; shared by single and batch recall."""
+        return recall_cache.fingerprint(
+            user_id, query_terms,
+            memory_type=memory_type, scope=scope, session_id=session_id,
+            tags=sorted(set(tags)) if tags else None, limit=limit, include_content=include_content,
+            snippet_chars=snippet_chars, snippet_windows=snippet_windows if snippet_chars else None,
+        )
+
+    @staticmethod
+    def _recall_filters(
+        user_id: str,
+        memory_type: Optional[str],
+        scope: Optional[str],
+        session_id: Optional[str],
+        tags: Optional[list[str]],
+    ) -> tuple[str, list]:
+        """WHERE clause and its parameters ($1..$n) shared by the recall candidate queries."""
+        conditions = [
+            "user_id = $1",
+            "is_active = TRUE",
+            "(expires_at IS NULL OR expires_at > NOW())"
+        ]
+        params: list = [user_id]
+        param_idx = 2
+
+        if memory_type:
+            conditions.append(f"memory_type = ${param_idx}")
+            params.append(memory_type)
+            param_idx += 1
+
+        if scope:
+            conditions.append(f"scope = ${param_idx}")
+            params.append(scope)
+            param_idx += 1
+
+        if session_id:
+            conditions.append(f"session_id = ${param_idx}")
+            params.append(session_id)
+            param_idx += 1
+
+        if tags:
+            conditions.append(f"tags && ${param_idx}")
+            params.append(tags)
+            param_idx += 1
+
+        return " AND ".join(conditions), params
+
+    @staticmethod
+    async def _memory_generation(conn, user_id: str) -> int:
+        return await conn.fetchval(
+            "SELECT generation FROM memory_corpus_stats WHERE user_id = $1", user_id
+        ) or 0
+
+    async def _fetch_candidates(
+        self, conn, user_id: str, where_clause: str, params: list,
+        token_sets: list[list[str]], windows: list[int], doc_freqs: dict[str, int],
+        include_content: bool = True,
+    ) -> list:
+        """
+        Candidate rows for one or more queries: for each query, the `window`
+        memories sharing the most of its keyword tokens, then up to the largest
+        window both the most recent memories (including any not yet indexed)
+        and the most important ones in the association graph.
+        Rows carry no ciphertext (see _split_cached); without content, they
+        carry their keyword index instead. Keyword matches are looked up by the query's rarest tokens only (see
+        _match_tokens) and at most RECALL_MATCH_SCAN_LIMIT of them are ranked,
+        so a common query term never turns the lookup into a full scan.
+        """
+        columns = "id, memory_type, scope, tags, relevance_score, access_count, created_at, updated_at, expires_at"
+        if not include_content:
+            columns += ", keyword_tokens, term_count"
+        idx = len(params)
+
+        rows = []
+        query_tokens = [token for tokens in token_sets for token in tokens]
+        if query_tokens:
+            # Blind-index lookup: per query, memories sharing the most query terms first
+            match_sets = [self._match_tokens(tokens, doc_freqs) for tokens in token_sets]
             rows = await conn.fetch(
                 f"""
-                SELECT id, memory_type, scope, content_encrypted, tags,
-                       relevance_score, access_count, created_at, updated_at
+                WITH queries AS (
+                    SELECT q.fetch_limit,
+                           array_agg(t.token) AS tokens,
+                           array_agg(t.token) FILTER (WHERE t.selective) AS match_tokens
+                    FROM unnest(${idx + 1}::text[], ${idx + 2}::int[], ${idx + 3}::bool[])
+                         AS t(token, query_no, selective)
+                    JOIN unnest(${idx + 4}::int[]) WITH ORDINALITY AS q(fetch_limit, query_no)
+                      ON q.query_no = t.query_no
+                    GROUP BY q.query_no, q.fetch_limit
+                ),
+                matched AS (
+                    SELECT DISTINCT m.id
+                    FROM queries CROSS JOIN LATERAL (
+                        SELECT scan.id
+                        FROM (
+                            SELECT id, keyword_tokens, created_at FROM memory_entries
+                            WHERE {where_clause} AND keyword_tokens && queries.match_tokens
+                            LIMIT {self.RECALL_MATCH_SCAN_LIMIT}
+                        ) AS scan
+                        ORDER BY cardinality(ARRAY(
+                                     SELECT unnest(scan.keyword_tokens) INTERSECT SELECT unnest(queries.tokens)
+                                 )) DESC,
+                                 scan.created_at DESC
+                        LIMIT queries.fetch_limit
+                    ) AS m
+                )
+                SELECT {columns}
                 FROM memory_entries
-                WHERE {where_clause}
-                ORDER BY created_at DESC
-                LIMIT {limit * 3}
+                WHERE id IN (SELECT id FROM matched)
                 """,
-                *params
+                *params,
+                query_tokens,
+                [n for n, tokens in enumerate(token_sets, 1) for _ in tokens],
+                [token in match_sets[n] for n, tokens in enumerate(token_sets) for token in tokens],
+                windows
             )
 
+        top_up = max(windows) - len(rows)
+        if top_up > 0:
+            # Top up with the most recent memories (including any not yet indexed)
+            # and the most central ones (idx_memory_entries_user_importance)
+            rows += await conn.fetch(
+                f"""
+                (SELECT {columns}
+                 FROM memory_entries
+                 WHERE {where_clause} AND NOT (id = ANY(${idx + 1}))
+                 ORDER BY created_at DESC
+                 LIMIT {top_up})
+                UNION
+                (SELECT {columns}
+                 FROM memory_entries
+                 WHERE {where_clause} AND NOT (id = ANY(${idx + 1})) AND relevance_score IS NOT NULL
+                 ORDER BY relevance_score DESC NULLS LAST
+                 LIMIT {top_up})
+                """,
+                *params, [row["id"] for row in rows]
+            )
+        return rows
+
+    def _match_tokens(self, tokens: list[str], doc_freqs: dict[str, int]) -> set[str]:
+        """
+        The query's rarest tokens whose document frequencies together stay within
+        RECALL_MATCH_SCAN_LIMIT (always at least the rarest one). Memories sharing
+        only common terms still compete through the recency top-up, and BM25
+        weights those terms lowest anyway.
+        """
+        selected: set[str] = set()
+        postings = 0
+        for token in sorted(set(tokens), key=lambda t: doc_freqs.get(t, 0)):
+            doc_freq = doc_freqs.get(token, 0)
+            if selected and postings + doc_freq > self.RECALL_MATCH_SCAN_LIMIT:
+                break
+            selected.add(token)
+            postings += doc_freq
+        return selected
+
+    @staticmethod
+    def _index_record(row) -> dict:
+        """Content-free stand-in for a decrypted record, scored from the row's keyword index."""
+        return {
+            "content": None,
+            "tokens": frozenset(row["keyword_tokens"] or ()),
+            "length": row["term_count"] or 0,
+        }
+
+    @staticmethod
+    def _candidate_features(candidates: list[tuple]) -> tuple[np.ndarray, ...]:
+        """
+        Query-independent scoring inputs: document lengths, access counts, ages
+        in hours and graph importance (0 until importance.py has scored the memory).
+        """
+        now = datetime.now(timezone.utc)
+        doc_lengths = np.array([
+            len(record["terms"]) if "terms" in record else record["length"] for _, record in candidates
+        ])
+        access_counts = np.array([row["access_count"] for row, _ in candidates])
+        ages = np.array([
+            (now - row["created_at"].replace(tzinfo=timezone.utc)).total_seconds() / 3600
+            for row, _ in candidates
+        ])
+        centrality = np.array([row["relevance_score"] or 0.0 for row, _ in candidates], dtype=np.float64)
+        return doc_lengths, access_counts, ages, centrality
+
+    @staticmethod
+    def _rank(
+        scorer: BM25Scorer, query_tokens: list[str], candidates: list[tuple], features: tuple, limit: int,
+        snippets: Optional[tuple[int, int]] = None,
+    ) -> tuple[list[dict], Optional[datetime]]:
+        """
+        Score the candidate window in one vectorized pass and return the top
+        results, plus the earliest expiry among them (for the recall cache).
+        Content-free records count each query term present once. With
+        snippets=(budget_chars, max_windows), the selected results carry the
+        best-matching passages instead of their content.
+        """
+        doc_lengths, access_counts, ages, centrality = features
+        term_frequencies = np.array(
+            [
+                scorer.term_frequency_row(record["terms"]) if "terms" in record
+                else [1 if token in record["tokens"] else 0 for token in query_tokens]
+                for _, record in candidates
+            ],
+            dtype=np.float64,
+        ).reshape(len(candidates), len(scorer.query_terms))
+        scores = analogic.score_batch(scorer, term_frequencies, doc_lengths, access_counts, ages, centrality)
+
         results = []
-        for row in rows:
-            try:
-                decrypted = decrypt_with_user_key(bytes(row["content_encrypted"]), user_id)
-                recency_hours = (now - row["created_at"].replace(tzinfo=timezone.utc)).total_seconds() / 3600
-                score = analogic.compute_relevance_score(
-                    query_keywords, decrypted,
-                    access_count=row["access_count"],
-                    recency_hours=recency_hours,
+        valid_until = None
+        for idx in top_k_indices(scores, limit):
+            row, record = candidates[idx]
+            if row["expires_at"] is not None:
+                valid_until = min(valid_until or row["expires_at"], row["expires_at"])
+            result = {
+                "id": str(row["id"]),
+                "memory_type": row["memory_type"],
+                "scope": row["scope"],
+                "content": record["content"],
+                "tags": row["tags"],
+                "relevance_score": float(scores[idx]),
+                "access_count": row["access_count"],
+                "created_at": row["created_at"].isoformat(),
+            }
+            if record["content"] is None:
+                del result["content"]
+            elif snippets:
+                result["snippets"] = best_snippets(record["content"], scorer.query_terms, *snippets)
+                del result["content"]
+            results.append(result)
+        return results, valid_until
+
+    # ─────────────────────────────────────────────
+    # ANALOGIC RECALL (SPREADING ACTIVATION)
+    # ─────────────────────────────────────────────
+
+    async def recall_by_activation(
+        self,
+        user_id: str,
+        query: str,
+        seed_count: int = 5,
+        max_depth: int = 3,
+        fanout: int = 10,
+        threshold: float = 0.05,
+        limit: int = DEFAULT_RECALL_LIMIT,
+        include_content: bool = True,
+        type_weights: Optional[dict[str, float]] = None,
+    ) -> list[dict]:
+        """
+        Multi-hop analogic recall: the top keyword recall hits seed spreading
+        activation through the association graph (see
+        AnalogicCore.spread_activation), seeded with their relevance scores.
+        Returns the `limit` most activated active memories.
+        """
+        seeds = await self.recall_memory(
+            user_id, query, limit=seed_count, include_content=False, record_access=False
+        )
+        activated = await analogic.spread_activation(
+            user_id,
+            {UUID(s["id"]): s["relevance_score"] for s in seeds},
+            max_depth=max_depth, fanout=fanout, threshold=threshold, type_weights=type_weights,
+        )
+        # Over-fetch: activated memories may since have been deleted or expired
+        candidates = activated[:limit * self.RECALL_CANDIDATE_MULTIPLIER]
+        if not candidates:
+            return []
+
+        async with get_connection() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT id, memory_type, scope, tags, access_count, created_at
+                FROM memory_entries
+                WHERE user_id = $1 AND id = ANY($2) AND is_active = TRUE
+                  AND (expires_at IS NULL OR expires_at > NOW())
+                """,
+                user_id, [c["id"] for c in candidates]
+            )
+            rows_by_id = {row["id"]: row for row in rows}
+            records = {}
+            if include_content:
+                records, ciphertexts = await self._split_cached(conn, user_id, rows)
+        if include_content:
+            records.update(await self._decrypt_records(user_id, rows, ciphertexts))
+
+        results = []
+        for c in candidates:
+            row = rows_by_id.get(c["id"])
+            if row is None or (include_content and str(row["id"]) not in records):
+                continue
+            result = {
+                "id": str(row["id"]),
+                "memory_type": row["memory_type"],
+                "scope": row["scope"],
+                "tags": row["tags"],
+                "activation": c["activation"],
+                "hops": c["hops"],
+                "access_count": row["access_count"],
+                "created_at": row["created_at"].isoformat(),
+            }
+            if include_content:
+                result["content"] = records[str(row["id"])]["content"]
+            results.append(result)
+            if len(results) == limit:
+                break
+
+        access_counters.record([UUID(r["id"]) for r in results])
+        return results
+
+    # ─────────────────────────────────────────────
+    # LIST MEMORIES
+    # ─────────────────────────────────────────────
+
+    async def iter_memories(
+        self,
+        user_id: str,
+        memory_type: Optional[str] = None,
+        scope: Optional[str] = None,
+        session_id: Optional[str] = None,
+        tags: Optional[list[str]] = None,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+        include_content: bool = True,
+    ) -> AsyncIterator[dict]:
+        """
+        Yield a user's active memories, newest first, one keyset-paginated chunk
+        of LIST_CHUNK_SIZE rows at a time, so the first records are available
+        before the rest are fetched. Each chunk checks a connection out only
+        for its own query; none is held while the consumer processes records.
+        `after` is a list cursor (see list_memories) to resume after; without
+        content, rows are served from the covering listing index. A memory that
+        fails to decrypt is yielded with content None and error "decryption_failed".
+        """
+        base_where, base_params = self._recall_filters(user_id, memory_type, scope, session_id, tags)
+        keyset = decode_list_cursor(after) if after is not None else None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            chunk_size = self.LIST_CHUNK_SIZE if remaining is None else min(self.LIST_CHUNK_SIZE, remaining)
+            where_clause, params = base_where, list(base_params)
+            if keyset is not None:
+                # Keyset condition: no OFFSET, so deep pages cost the same as the first
+                where_clause += f" AND (created_at, id) < (${len(params) + 1}, ${len(params) + 2})"
+                params += list(keyset)
+            async with get_connection() as conn:
+                rows = await conn.fetch(
+                    f"""
+                    SELECT id, memory_type, scope, session_id, tags, access_count, created_at, expires_at
+                           {", content_encrypted" if include_content else ""}
+                    FROM memory_entries
+                    WHERE {where_clause}
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT {chunk_size}
+                    """,
+                    *params
                 )
-                results.append({
-                    "id": str(row["id"]),
+            if not rows:
+                return
+            contents = await self._list_contents(user_id, rows) if include_content else {}
+
+            for row in rows:
+                memory_id = str(row["id"])
+                record = {
+                    "id": memory_id,
                     "memory_type": row["memory_type"],
                     "scope": row["scope"],
-                    "content": decrypted,
+                    "session_id": row["session_id"],
                     "tags": row["tags"],
-                    "relevance_score": score,
                     "access_count": row["access_count"],
                     "created_at": row["created_at"].isoformat(),
-                })
-            except Exception as e:
-                logger.error(f"Failed to decrypt memory {row['id']}: {e}")
+                    "expires_at": row["expires_at"].isoformat() if row["expires_at"] else None,
+                }
+                if include_content:
+                    record["content"] = contents.get(memory_id)
+                    if record["content"] is None:
+                        # Kept in place so page sizes and cursors stay exact
+                        record["error"] = "decryption_failed"
+                yield record
 
-        # Sort by relevance and return top results
-        results.sort(key=lambda x: x["relevance_score"], reverse=True)
-        results = results[:limit]
+            if len(rows) < chunk_size:
+                return
+            keyset = (rows[-1]["created_at"], rows[-1]["id"])
+            if remaining is not None:
+                remaining -= len(rows)
 
-        # Increment access count for recalled memories
-        if results:
-            recalled_ids = [UUID(r["id"]) for r in results]
-            async with get_connection() as conn:
-                await conn.execute(
-                    "UPDATE memory_entries SET access_count = access_count + 1, updated_at = NOW() WHERE id = ANY($1)",
-                    recalled_ids
-                )
+    async def list_memories(
+        self,
+        user_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        include_content: bool = True,
+        **filters,
+    ) -> dict:
+        """
+        One page of a user's memories, newest first. Pass the returned
+        next_cursor back to continue; it is None on the last page.
+        """
+        memories = [
+            m async for m in self.iter_memories(
+                user_id, limit=limit + 1, after=cursor, include_content=include_content, **filters
+            )
+        ]
+        next_cursor = None
+        if len(memories) > limit:
+            memories = memories[:limit]
+            next_cursor = encode_list_cursor(memories[-1]["created_at"], memories[-1]["id"])
+        return {"memories": memories, "next_cursor": next_cursor}
 
-        return results
+    async def _list_contents(self, user_id: str, rows) -> dict[str, str]:
+        """Plaintext of a chunk of listed rows, reusing cached records without adding to the working set."""
+        contents = {
+            memory_id: record["content"]
+            for memory_id, record in working_set.get_many(user_id, [str(r["id"]) for r in rows]).items()
+        }
+        pending = [r for r in rows if str(r["id"]) not in contents]
+        if pending:
+            decrypted_batch = await asyncio.to_thread(
+                decrypt_many_with_user_key, [bytes(r["content_encrypted"]) for r in pending], user_id
+            )
+            for row, decrypted in zip(pending, decrypted_batch):
+                if isinstance(decrypted, Exception):
+                    logger.error(f"Failed to decrypt memory {row['id']}: {decrypted}")
+                    continue
+                contents[str(row["id"])] = decrypted
+        return contents
+
+    # ─────────────────────────────────────────────
+    # WORKING-SET CACHE
+    # ─────────────────────────────────────────────
+
+    @staticmethod
+    def _cache_record(user_id: str, row, content: str) -> dict:
+        """Build a decrypted record (with its tokenized terms) and add it to the working set."""
+        record = {
+            "id": str(row["id"]),
+            "memory_type": row["memory_type"],
+            "scope": row["scope"],
+            "tags": row["tags"],
+            "content": content,
+            "terms": tokenize(content),
+            "access_count": row["access_count"],
+            "created_at": row["created_at"],
+        }
+        working_set.put(user_id, record)
+        return record
+
+    async def _split_cached(self, conn, user_id: str, rows) -> tuple[dict[str, dict], dict[str, bytes]]:
+        """
+        Separate candidate rows into working-set hits and ciphertexts still to
+        decrypt. Cache hits are decided here, so ciphertext is read only for
+        the candidates missing from the working set.
+        """
+        records = working_set.get_many(user_id, [str(row["id"]) for row in rows])
+        ciphertexts = {}
+        missing = [row["id"] for row in rows if str(row["id"]) not in records]
+        if missing:
+            for r in await conn.fetch(
+                "SELECT id, content_encrypted FROM memory_entries WHERE id = ANY($1)", missing
+            ):
+                ciphertexts[str(r["id"])] = bytes(r["content_encrypted"])
+        return records, ciphertexts
+
+    async def _decrypt_records(self, user_id: str, rows, ciphertexts: dict[str, bytes]) -> dict[str, dict]:
+        """Decrypt ciphertexts in one batch off the event loop and cache the resulting records."""
+        if not ciphertexts:
+            return {}
+        memory_ids = list(ciphertexts)
+        decrypted_batch = await asyncio.to_thread(
+            decrypt_many_with_user_key, [ciphertexts[memory_id] for memory_id in memory_ids], user_id
+        )
+        rows_by_id = {str(row["id"]): row for row in rows}
+        records = {}
+        for memory_id, decrypted in zip(memory_ids, decrypted_batch):
+            if isinstance(decrypted, Exception):
+                logger.error(f"Failed to decrypt memory {memory_id}: {decrypted}")
+                continue
+            records[memory_id] = self._cache_record(user_id, rows_by_id[memory_id], decrypted)
+        return records
 
     # ─────────────────────────────────────────────
     # GET / DELETE MEMORY
     # ─────────────────────────────────────────────
 
-    async def get_memory(self, memory_id: UUID, user_id: str) -> Optional[dict]:
-        """Retrieve a single memory entry by ID."""
+    async def get_memory(self, memory_id: UUID, user_id: str, include_content: bool = True) -> Optional[dict]:
+        """
+        Retrieve a single memory entry by ID (concurrent identical lookups share
+        one execution). Without content, the ciphertext is neither read nor decrypted.
+        """
+        if in_unit_of_work():
+            return await self._get_memory(memory_id, user_id, include_content)
+        result = await read_flights.do(
+            ("get", user_id, memory_id, include_content),
+            lambda: self._get_memory(memory_id, user_id, include_content)
+        )
+        return dict(result) if result else None
+
+    async def _get_memory(self, memory_id: UUID, user_id: str, include_content: bool = True) -> Optional[dict]:
+        cached = working_set.get(user_id, str(memory_id)) if include_content else None
         async with get_connection() as conn:
             row = await conn.fetchrow(
                 """
-                SELECT id, user_id, memory_type, scope, content_encrypted, tags,
-                       relevance_score, access_count, created_at, expires_at
+                SELECT id, user_id, memory_type, scope, tags,
+                       relevance_score, access_count, created_at, expires_at, association_status,
+                       CASE WHEN $3 THEN NULL ELSE content_encrypted END AS content_encrypted
                 FROM memory_entries
                 WHERE id = $1 AND user_id = $2 AND is_active = TRUE
                 """,
-                memory_id, user_id
+                memory_id, user_id, cached is not None or not include_content
             )
         if not row:
             return None
 
-        decrypted = decrypt_with_user_key(bytes(row["content_encrypted"]), user_id)
-        return {
+        result = {
             "id": str(row["id"]),
             "user_id": row["user_id"],
             "memory_type": row["memory_type"],
             "scope": row["scope"],
-            "content": decrypted,
             "tags": row["tags"],
             "access_count": row["access_count"],
             "created_at": row["created_at"].isoformat(),
             "expires_at": row["expires_at"].isoformat() if row["expires_at"] else None,
+            "association_status": row["association_status"],
         }
+        if include_content:
+            if cached is not None:
+                result["content"] = cached["content"]
+            else:
+                result["content"] = await asyncio.to_thread(
+                    decrypt_with_user_key, bytes(row["content_encrypted"]), user_id
+                )
+                self._cache_record(user_id, row, result["content"])
+        return result
 
     async def delete_memory(self, memory_id: UUID, user_id: str) -> bool:
         """Soft-delete a memory entry."""
-        async with get_connection() as conn:
-            result = await conn.execute(
-                "UPDATE memory_entries SET is_active = FALSE, updated_at = NOW() WHERE id = $1 AND user_id = $2",
+        async with unit_of_work() as conn:
+            row = await conn.fetchrow(
+                """
+                UPDATE memory_entries SET is_active = FALSE, updated_at = NOW()
+                WHERE id = $1 AND user_id = $2 AND is_active = TRUE
+                RETURNING keyword_tokens, term_count
+                """,
                 memory_id, user_id
             )
-        return result.split()[-1] == "1"
+            if not row:
+                return False
+            if row["term_count"] is not None:
+                await self._apply_corpus_delta(
+                    conn, user_id, -1, -row["term_count"],
+                    {token: -1 for token in row["keyword_tokens"] or []}
+                )
+            else:
+                await bump_memory_generations(conn, [user_id])
+            # The memory and its associations leave the user's graph
+            await AnalogicCore.mark_graphs_dirty(conn, [user_id])
+            after_commit(lambda: association_graphs.invalidate(user_id))
+        working_set.invalidate(user_id, str(memory_id))
+        return True
 
     async def purge_expired_memories(self) -> int:
         """Hard-delete expired short-term memories (run as periodic task)."""
         async with get_connection() as conn:
-            result = await conn.execute(
-                "DELETE FROM memory_entries WHERE scope = 'short_term' AND expires_at < NOW()"
+            purged_rows = await conn.fetch(
+                f"""
+                WITH purged AS (
+                    DELETE FROM memory_entries
+                    WHERE scope = 'short_term' AND expires_at < NOW()
+                    RETURNING id, user_id, keyword_tokens, term_count, is_active
+                ),
+                released AS (
+                    SELECT user_id, keyword_tokens, term_count FROM purged
+                    WHERE is_active AND term_count IS NOT NULL
+                ),
+                {RELEASE_CORPUS_STATS_CTES},
+                {AnalogicCore.MARK_GRAPHS_DIRTY_CTE.format(users="SELECT user_id FROM purged WHERE is_active")}
+                SELECT id, user_id FROM purged
+                """
             )
-        count = int(result.split()[-1])
+            await conn.execute("DELETE FROM memory_term_stats WHERE doc_freq <= 0")
+            for user_id in {r["user_id"] for r in purged_rows}:
+                after_commit(partial(association_graphs.invalidate, user_id))
+        for r in purged_rows:
+            working_set.invalidate(r["user_id"], str(r["id"]))
+        count = len(purged_rows)
         if count > 0:
             logger.info(f"Purged {count} expired short-term memories.")
         return count
 
+    # ─────────────────────────────────────────────
+    # CORPUS STATISTICS (BM25)
+    # ─────────────────────────────────────────────
+
+    async def _apply_corpus_delta(
+        self, conn, user_id: str, doc_delta: int, term_delta: int, token_deltas: dict[str, int]
+    ):
+        """
+        Adjust a user's document count, total term count and per-term document
+        frequencies, and bump their memory generation.
+        """
+        await conn.execute(
+            """
+            INSERT INTO memory_corpus_stats (user_id, doc_count, total_terms, generation)
+            VALUES ($1, $2, $3, 1)
+            ON CONFLICT (user_id) DO UPDATE
+            SET doc_count = memory_corpus_stats.doc_count + EXCLUDED.doc_count,
+                total_terms = memory_corpus_stats.total_terms + EXCLUDED.total_terms,
+                generation = memory_corpus_stats.generation + 1
+            """,
+            user_id, doc_delta, term_delta
+        )
+        if token_deltas:
+            # Upsert in a fixed order so concurrent writers lock rows consistently
+            tokens = sorted(token_deltas)
+            await conn.execute(
+                """
+                INSERT INTO memory_term_stats (user_id, term_token, doc_freq)
+                SELECT $1, t.term_token, t.delta
+                FROM unnest($2::text[], $3::bigint[]) AS t(term_token, delta)
+                ORDER BY t.term_token
+                ON CONFLICT (user_id, term_token) DO UPDATE
+                SET doc_freq = memory_term_stats.doc_freq + EXCLUDED.doc_freq
+                """,
+                user_id, tokens, [token_deltas[t] for t in tokens]
+            )
+
+    async def _load_corpus_stats(self, conn, user_id: str, tokens: list[str]) -> tuple[int, float, dict[str, int]]:
+        """A user's document count, average document length and the document frequency of each token."""
+        corpus = await conn.fetchrow(
+            "SELECT doc_count, total_terms FROM memory_corpus_stats WHERE user_id = $1",
+            user_id
+        )
+        doc_freqs: dict[str, int] = {}
+        if tokens:
+            rows = await conn.fetch(
+                "SELECT term_token, doc_freq FROM memory_term_stats WHERE user_id = $1 AND term_token = ANY($2)",
+                user_id, tokens
+            )
+            doc_freqs = {r["term_token"]: r["doc_freq"] for r in rows}
+
+        doc_count = corpus["doc_count"] if corpus else 0
+        avg_doc_length = corpus["total_terms"] / doc_count if doc_count > 0 else 0.0
+        return doc_count, avg_doc_length, doc_freqs
+
+    @staticmethod
+    def _bm25_scorer(corpus: tuple, query_terms: list[str], query_tokens: list[str]) -> BM25Scorer:
+        """Build a BM25 scorer for a query from loaded corpus statistics."""
+        doc_count, avg_doc_length, freqs_by_token = corpus
+        doc_freqs = {
+            term: freqs_by_token[token]
+            for term, token in zip(query_terms, query_tokens) if token in freqs_by_token
+        }
+        return BM25Scorer(query_terms, doc_freqs, doc_count, avg_doc_length)
+
+    async def migrate_legacy_memories(self, batch_size: int = KEY_MIGRATION_BATCH_SIZE) -> int:
+        """
+        Re-encrypt memories stored under an older key scheme with the current one
+        and (re)build the blind keyword index and BM25 statistics for rows not
+        yet counted in them (e.g. stored before the index existed, or restored).
+        Works through rows in id order, one batch per transaction, so it can run
+        alongside live traffic. Returns the number of rows migrated.
+        """
+        migrated = 0
+        last_id = None
+        while True:
+            async with get_connection() as conn:
+                async with conn.transaction():
+                    rows = await conn.fetch(
+                        """
+                        SELECT id, user_id, content_encrypted, term_count, is_active
+                        FROM memory_entries
+                        WHERE (key_version < $1 OR term_count IS NULL)
+                          AND ($2::uuid IS NULL OR id > $2)
+                        ORDER BY id
+                        LIMIT $3
+                        FOR UPDATE SKIP LOCKED
+                        """,
+                        CURRENT_KEY_VERSION, last_id, batch_size
+                    )
+                    if not rows:
+                        break
+                    last_id = rows[-1]["id"]
+
+                    rows_by_user: dict[str, list] = {}
+                    for row in rows:
+                        rows_by_user.setdefault(row["user_id"], []).append(row)
+
+                    ids, blobs, token_lists, term_counts = [], [], [], []
+                    for owner, user_rows in rows_by_user.items():
+                        plaintexts = await asyncio.to_thread(
+                            decrypt_many_with_user_key, [bytes(r["content_encrypted"]) for r in user_rows], owner
+                        )
+                        readable = []
+                        for row, plaintext in zip(user_rows, plaintexts):
+                            if isinstance(plaintext, Exception):
+                                logger.error(f"Key migration skipped memory {row['id']}: {plaintext}")
+                                continue
+                            readable.append((row, plaintext))
+                        if not readable:
+                            continue
+                        encrypted = await asyncio.to_thread(
+                            encrypt_many_with_user_key, [plaintext for _, plaintext in readable], owner
+                        )
+
+                        docs, total_terms, token_deltas = 0, 0, {}
+                        for (row, plaintext), blob in zip(readable, encrypted):
+                            if isinstance(blob, Exception):
+                                logger.error(f"Key migration skipped memory {row['id']}: {blob}")
+                                continue
+                            terms = tokenize(plaintext)
+                            tokens = blind_index_tokens(list(dict.fromkeys(terms)), owner)
+                            ids.append(row["id"])
+                            blobs.append(blob)
+                            # Postgres arrays cannot be ragged, so tokens travel as one string
+                            token_lists.append(" ".join(tokens))
+                            term_counts.append(len(terms))
+                            if row["term_count"] is None and row["is_active"]:
+                                docs += 1
+                                total_terms += len(terms)
+                                for token in tokens:
+                                    token_deltas[token] = token_deltas.get(token, 0) + 1
+                        if docs:
+                            await self._apply_corpus_delta(conn, owner, docs, total_terms, token_deltas)
+
+                    if ids:
+                        await conn.execute(
+                            """
+                            UPDATE memory_entries AS me
+                            SET content_encrypted = v.content_encrypted,
+                                key_version = $5,
+                                keyword_tokens = string_to_array(v.tokens, ' '),
+                                term_count = v.term_count
+                            FROM unnest($1::uuid[], $2::bytea[], $3::text[], $4::int[])
+                                AS v(id, content_encrypted, tokens, term_count)
+                            WHERE me.id = v.id
+                            """,
+                            ids, blobs, token_lists, term_counts, CURRENT_KEY_VERSION
+                        )
+                        migrated += len(ids)
+
+        if migrated:
+            logger.info(f"Key migration: re-encrypted and indexed {migrated} legacy memories.")
+        return migrated
+
     # ─────────────────────────────────────────────
     # CONTEXT SESSIONS
     # ─────────────────────────────────────────────
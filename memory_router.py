@@ -4,7 +4,10 @@ Analogic Memory System for Omnira Synora AI
 
 Endpoints:
   POST   /memory/store          - Store a new memory
+  POST   /memory/store/batch    - Store many memories in one request
   POST   /memory/recall         - Recall memories by context/query
+  POST   /memory/recall/batch   - Recall for several queries of one user
+  GET    /memory/list/{user}    - Page through a user's memories (JSON or NDJSON stream)
   GET    /memory/{id}           - Get a specific memory
   DELETE /memory/{id}           - Soft-delete a memory
   GET    /memory/stats/{user}   - User memory statistics
@@ -16,20 +19,30 @@ Endpoints:
   GET    /backup/verify/{id}    - Verify backup integrity
   POST   /analogic/associate    - Create analogic association
   GET    /analogic/graph/{id}   - Get association graph
+  POST   /analogic/recall       - Multi-hop spreading-activation recall
+  POST   /analogic/traverse     - Bounded multi-hop graph traversal
+  GET    /system/metrics        - Cache and background queue statistics
 """
 
+import json
 import logging
 import os
-from typing import Optional
+from contextlib import aclosing
+from typing import Annotated, AsyncIterator, Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Header, Query, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from memory_engine import MemoryEngine
+from memory_engine import MemoryEngine, access_counters, decode_list_cursor
 from backup_system import BackupSystem
 from analogic_core import AnalogicCore
-from security import verify_api_token, hash_api_token
+from association_queue import association_queue
+from memory_cache import recall_cache, working_set
+from graph_cache import association_graphs
+from security import verify_api_token, hash_api_token, key_cache_stats
+from singleflight import read_flights
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +54,10 @@ analogic = AnalogicCore()
 # Stored API token hash (in production, store in DB or secrets manager)
 _API_TOKEN_HASH = hash_api_token(os.getenv("API_TOKEN", "dev-token-change-in-production"))
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+DEFAULT_LIST_LIMIT = 100
+MAX_LIST_LIMIT = 1000  # For buffered JSON responses; NDJSON streams are unbounded
+
 
 # ─────────────────────────────────────────────
 # AUTH DEPENDENCY
@@ -52,6 +69,76 @@ async def require_auth(x_api_token: str = Header(..., alias="X-API-Token")):
     return True
 
 
+# ─────────────────────────────────────────────
+# STREAMING
+# ─────────────────────────────────────────────
+
+def wants_ndjson(accept: Optional[str]) -> bool:
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+
+def ndjson_response(records: AsyncIterator[dict], operation: str) -> StreamingResponse:
+    """
+    Stream records as newline-delimited JSON. Headers are already sent when a
+    record fails, so errors end the stream with a final {"error": ...} line.
+    The record source is closed as soon as the stream ends, including when
+    the client disconnects.
+    """
+    async def lines():
+        try:
+            async with aclosing(records):
+                async for record in records:
+                    yield json.dumps(record, default=str) + "\n"
+        except Exception as e:
+            logger.exception(f"{operation} stream error: {e}")
+            yield json.dumps({"error": "Internal server error."}) + "\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def _iterate(records: list[dict]) -> AsyncIterator[dict]:
+    for record in records:
+        yield record
+
+
+# ─────────────────────────────────────────────
+# FIELD PROJECTION
+# ─────────────────────────────────────────────
+
+RECALL_FIELDS = frozenset({
+    "id", "memory_type", "scope", "content", "snippets", "tags", "relevance_score", "access_count", "created_at",
+})
+MEMORY_FIELDS = frozenset({
+    "id", "user_id", "memory_type", "scope", "content", "tags", "access_count",
+    "created_at", "expires_at", "association_status",
+})
+
+
+def parse_fields(fields: Optional[list[str]], allowed: frozenset) -> Optional[frozenset]:
+    """Validated set of requested fields (id is always returned), or None for all fields."""
+    if not fields:
+        return None
+    requested = frozenset(f.strip() for item in fields for f in item.split(",") if f.strip())
+    unknown = requested - allowed
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(sorted(allowed))}.",
+        )
+    return requested | {"id"}
+
+
+def project(record: dict, fields: Optional[frozenset], max_content_chars: Optional[int]) -> dict:
+    """Apply a field selection and content truncation to one response record."""
+    if fields is not None:
+        record = {key: value for key, value in record.items() if key in fields}
+    content = record.get("content")
+    if max_content_chars and content and len(content) > max_content_chars:
+        record["content"] = content[:max_content_chars]
+        record["content_truncated"] = True
+    return record
+
+
 # ─────────────────────────────────────────────
 # PYDANTIC SCHEMAS
 # ─────────────────────────────────────────────
@@ -65,6 +152,9 @@ class StoreMemoryRequest(BaseModel):
     tags: Optional[list[str]] = Field(default_factory=list)
     ttl_hours: Optional[int] = Field(None, ge=1, le=8760)
 
+class StoreMemoryBatchRequest(BaseModel):
+    memories: list[StoreMemoryRequest] = Field(..., min_length=1, max_length=MemoryEngine.MAX_BATCH_STORE_ITEMS)
+
 class RecallMemoryRequest(BaseModel):
     user_id: str = Field(..., min_length=1, max_length=255)
     query: str = Field(..., min_length=1)
@@ -73,6 +163,22 @@ class RecallMemoryRequest(BaseModel):
     session_id: Optional[str] = None
     tags: Optional[list[str]] = None
     limit: int = Field(20, ge=1, le=100)
+    fields: Optional[list[str]] = None  # Omit "content" to skip decryption entirely
+    max_content_chars: Optional[int] = Field(None, ge=1)
+    snippet_chars: Optional[int] = Field(None, ge=20, le=MemoryEngine.MAX_CONTENT_LENGTH)
+    snippet_windows: int = Field(1, ge=1, le=5)
+
+class RecallQuery(BaseModel):
+    query: str = Field(..., min_length=1)
+    limit: int = Field(20, ge=1, le=100)
+
+class RecallMemoryBatchRequest(BaseModel):
+    user_id: str = Field(..., min_length=1, max_length=255)
+    queries: list[RecallQuery] = Field(..., min_length=1, max_length=MemoryEngine.MAX_BATCH_RECALL_QUERIES)
+    memory_type: Optional[str] = None
+    scope: Optional[str] = None
+    session_id: Optional[str] = None
+    tags: Optional[list[str]] = None
 
 class CreateSessionRequest(BaseModel):
     user_id: str
@@ -90,6 +196,28 @@ class RestoreRequest(BaseModel):
     backup_id: Optional[str] = None
     backup_path: Optional[str] = None
 
+class ActivationRecallRequest(BaseModel):
+    user_id: str = Field(..., min_length=1, max_length=255)
+    query: str = Field(..., min_length=1)
+    seed_count: int = Field(5, ge=1, le=20)
+    max_depth: int = Field(3, ge=1, le=5)
+    fanout: int = Field(10, ge=1, le=50)
+    threshold: float = Field(0.05, gt=0.0, le=1.0)
+    limit: int = Field(20, ge=1, le=100)
+    include_content: bool = True
+    # Overrides of AnalogicCore.ACTIVATION_TYPE_WEIGHTS, each within 0..1
+    type_weights: Optional[dict[str, Annotated[float, Field(ge=0.0, le=1.0)]]] = None
+
+class TraverseRequest(BaseModel):
+    user_id: str = Field(..., min_length=1, max_length=255)
+    seeds: list[UUID] = Field(..., min_length=1, max_length=50)
+    max_depth: int = Field(2, ge=1, le=AnalogicCore.TRAVERSE_MAX_DEPTH)
+    association_types: Optional[list[str]] = None  # Default: every type
+    direction: str = Field("both", pattern="^(outgoing|incoming|both)$")
+    min_strength: float = Field(0.0, ge=0.0, le=1.0)
+    max_nodes: int = Field(200, ge=1, le=AnalogicCore.TRAVERSE_MAX_NODES)
+    max_edges: int = Field(500, ge=1, le=AnalogicCore.TRAVERSE_MAX_EDGES)
+
 class AssociateRequest(BaseModel):
     source_memory_id: str
     target_memory_id: str
@@ -122,9 +250,44 @@ async def store_memory(req: StoreMemoryRequest, _auth=Depends(require_auth)):
         raise HTTPException(status_code=500, detail="Internal server error.")
 
 
+@router.post("/memory/store/batch", tags=["Memory"])
+async def store_memories_batch(req: StoreMemoryBatchRequest, _auth=Depends(require_auth)):
+    """Store many encrypted memory entries, returning a status per item."""
+    try:
+        results = await engine.store_memories_batch([m.model_dump() for m in req.memories])
+        stored = sum(1 for r in results if r["status"] == "stored")
+        duplicates = sum(1 for r in results if r["status"] == "duplicate")
+        return {
+            "success": True,
+            "stored": stored,
+            "duplicates": duplicates,
+            "errors": len(results) - stored - duplicates,
+            "results": results,
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception(f"store_memories_batch error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+
 @router.post("/memory/recall", tags=["Memory"])
-async def recall_memory(req: RecallMemoryRequest, _auth=Depends(require_auth)):
-    """Recall relevant memories based on query context."""
+async def recall_memory(
+    req: RecallMemoryRequest,
+    accept: Optional[str] = Header(None),
+    _auth=Depends(require_auth)
+):
+    """
+    Recall relevant memories based on query context.
+    `fields` selects the returned fields; without "content" nothing is decrypted.
+    `snippet_chars` returns the passages best matching the query (within that
+    character budget) as "snippets" in place of the full content.
+    With Accept: application/x-ndjson, ranked memories are streamed one per line.
+    """
+    fields = parse_fields(req.fields, RECALL_FIELDS)
+    if req.snippet_chars and fields is not None and "snippets" not in fields:
+        # Snippets replace the content, so this selection would return neither
+        raise HTTPException(status_code=400, detail='snippet_chars requires "snippets" in fields.')
     try:
         results = await engine.recall_memory(
             user_id=req.user_id,
@@ -134,20 +297,107 @@ async def recall_memory(req: RecallMemoryRequest, _auth=Depends(require_auth)):
             session_id=req.session_id,
             tags=req.tags,
             limit=req.limit,
+            include_content=fields is None or bool({"content", "snippets"} & fields),
+            snippet_chars=req.snippet_chars,
+            snippet_windows=req.snippet_windows,
         )
+        results = [project(r, fields, req.max_content_chars) for r in results]
+        if wants_ndjson(accept):
+            return ndjson_response(_iterate(results), "recall_memory")
         return {"success": True, "count": len(results), "memories": results}
     except Exception as e:
         logger.exception(f"recall_memory error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error.")
 
 
+@router.post("/memory/recall/batch", tags=["Memory"])
+async def recall_memories_batch(req: RecallMemoryBatchRequest, _auth=Depends(require_auth)):
+    """Recall memories for several queries of one user, sharing one candidate fetch."""
+    try:
+        batches = await engine.recall_memories_batch(
+            user_id=req.user_id,
+            queries=[q.model_dump() for q in req.queries],
+            memory_type=req.memory_type,
+            scope=req.scope,
+            session_id=req.session_id,
+            tags=req.tags,
+        )
+        return {
+            "success": True,
+            "results": [
+                {"query": q.query, "count": len(memories), "memories": memories}
+                for q, memories in zip(req.queries, batches)
+            ],
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception(f"recall_memories_batch error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+
+@router.get("/memory/list/{user_id}", tags=["Memory"])
+async def list_memories(
+    user_id: str,
+    memory_type: Optional[str] = Query(None),
+    scope: Optional[str] = Query(None),
+    session_id: Optional[str] = Query(None),
+    tags: Optional[list[str]] = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: Optional[int] = Query(None, ge=1),
+    include_content: bool = Query(True),
+    accept: Optional[str] = Header(None),
+    _auth=Depends(require_auth)
+):
+    """
+    List a user's active memories, newest first, with keyset pagination.
+    Returns up to `limit` memories (default 100, at most 1,000) and a
+    next_cursor. With Accept: application/x-ndjson, every memory after the
+    cursor (up to `limit`, if given) is streamed one per line as it is decrypted.
+    """
+    filters = dict(memory_type=memory_type, scope=scope, session_id=session_id, tags=tags)
+    try:
+        if wants_ndjson(accept):
+            if cursor is not None:
+                decode_list_cursor(cursor)  # Reject a malformed cursor before streaming starts
+            return ndjson_response(
+                engine.iter_memories(user_id, limit=limit, after=cursor, include_content=include_content, **filters),
+                "list_memories",
+            )
+
+        page = await engine.list_memories(
+            user_id, min(limit or DEFAULT_LIST_LIMIT, MAX_LIST_LIMIT),
+            cursor=cursor, include_content=include_content, **filters
+        )
+        return {
+            "success": True,
+            "count": len(page["memories"]),
+            "memories": page["memories"],
+            "next_cursor": page["next_cursor"],
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception(f"list_memories error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+
 @router.get("/memory/{memory_id}", tags=["Memory"])
-async def get_memory(memory_id: UUID, user_id: str = Query(...), _auth=Depends(require_auth)):
+async def get_memory(
+    memory_id: UUID,
+    user_id: str = Query(...),
+    fields: Optional[list[str]] = Query(None, description="Comma-separated; omit content to skip decryption"),
+    max_content_chars: Optional[int] = Query(None, ge=1),
+    _auth=Depends(require_auth)
+):
     """Retrieve a specific memory entry by ID."""
-    result = await engine.get_memory(memory_id, user_id)
+    selected = parse_fields(fields, MEMORY_FIELDS)
+    result = await engine.get_memory(
+        memory_id, user_id, include_content=selected is None or "content" in selected
+    )
     if not result:
         raise HTTPException(status_code=404, detail="Memory not found.")
-    return {"success": True, "data": result}
+    return {"success": True, "data": project(result, selected, max_content_chars)}
 
 
 @router.delete("/memory/{memory_id}", tags=["Memory"])
@@ -265,7 +515,7 @@ async def create_association(req: AssociateRequest, _auth=Depends(require_auth))
 async def get_association_graph(
     memory_id: UUID,
     user_id: str = Query(...),
-    direction: str = Query("both"),
+    direction: str = Query("both", pattern="^(outgoing|incoming|both)$"),
     min_strength: float = Query(0.0, ge=0.0, le=1.0),
     _auth=Depends(require_auth)
 ):
@@ -274,6 +524,7 @@ async def get_association_graph(
         memory_id=memory_id,
         direction=direction,
         min_strength=min_strength,
+        user_id=user_id,
     )
     context = await analogic.get_analogic_context(user_id, [memory_id])
     return {
@@ -282,3 +533,75 @@ async def get_association_graph(
         "associations": associations,
         "graph_context": context,
     }
+
+
+@router.post("/analogic/recall", tags=["Analogic"])
+async def recall_by_activation(req: ActivationRecallRequest, _auth=Depends(require_auth)):
+    """
+    Recall memories by spreading activation from the best keyword matches
+    along their association chains (leads_to, derived_from, similar_to, ...).
+    """
+    if req.type_weights:
+        unknown = set(req.type_weights) - set(AnalogicCore.ASSOCIATION_TYPES)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown association types: {sorted(unknown)}")
+    try:
+        results = await engine.recall_by_activation(
+            user_id=req.user_id,
+            query=req.query,
+            seed_count=req.seed_count,
+            max_depth=req.max_depth,
+            fanout=req.fanout,
+            threshold=req.threshold,
+            limit=req.limit,
+            include_content=req.include_content,
+            type_weights=req.type_weights,
+        )
+        return {"success": True, "count": len(results), "memories": results}
+    except Exception as e:
+        logger.exception(f"recall_by_activation error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+
+@router.post("/analogic/traverse", tags=["Analogic"])
+async def traverse_graph(req: TraverseRequest, _auth=Depends(require_auth)):
+    """
+    Walk the association graph from several seed memories in one call and
+    return every reached memory (with its hop distance) and traversed edge.
+    """
+    try:
+        graph = await analogic.traverse(
+            user_id=req.user_id,
+            seeds=req.seeds,
+            max_depth=req.max_depth,
+            association_types=req.association_types,
+            direction=req.direction,
+            min_strength=req.min_strength,
+            max_nodes=req.max_nodes,
+            max_edges=req.max_edges,
+        )
+        return {"success": True, **graph}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception(f"traverse_graph error: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+
+# ─────────────────────────────────────────────
+# SYSTEM ENDPOINTS
+# ─────────────────────────────────────────────
+
+@router.get("/system/metrics", tags=["System"])
+async def get_metrics(_auth=Depends(require_auth)):
+    """In-process cache statistics (for the worker serving the request) and queue depth."""
+    return {
+        "success": True,
+        "recall_cache": recall_cache.stats(),
+        "working_set": working_set.stats(),
+        "association_graphs": association_graphs.stats(),
+        "key_cache": key_cache_stats(),
+        "access_counters": access_counters.stats(),
+        "coalesced_reads": read_flights.stats(),
+        "association_jobs": await association_queue.stats(),
+    }
@@ -0,0 +1,155 @@
+"""
+migrations.py - Incremental Schema Migrations
+Analogic Memory System for Omnira Synora AI
+
+Idempotent DDL applied at startup, after database.init_database()
+has created the base tables. Statements run in order inside one
+transaction guarded by an advisory lock, so concurrent workers
+starting together do not race each other.
+"""
+
+import logging
+
+from database import get_connection
+from memory_engine import RELEASE_CORPUS_STATS_CTES
+
+logger = logging.getLogger(__name__)
+
+_MIGRATION_LOCK_ID = 724_113_001  # Arbitrary, unique to this application
+
+MIGRATIONS: list[str] = [
+    # Key scheme of each ciphertext (1 = legacy PBKDF2, 2 = HKDF); see security.py
+    "ALTER TABLE memory_entries ADD COLUMN IF NOT EXISTS key_version SMALLINT NOT NULL DEFAULT 1",
+    """
+    CREATE INDEX IF NOT EXISTS idx_memory_entries_legacy_key
+        ON memory_entries (id) WHERE key_version < 2
+    """,
+    # Blind keyword index: per-user HMAC tokens of the content's words
+    "ALTER TABLE memory_entries ADD COLUMN IF NOT EXISTS keyword_tokens TEXT[]",
+    """
+    CREATE INDEX IF NOT EXISTS idx_memory_entries_keyword_tokens
+        ON memory_entries USING GIN (keyword_tokens) WHERE is_active
+    """,
+    # BM25 corpus statistics; term_count stays NULL until a row is counted in them
+    "ALTER TABLE memory_entries ADD COLUMN IF NOT EXISTS term_count INTEGER",
+    """
+    CREATE INDEX IF NOT EXISTS idx_memory_entries_uncounted
+        ON memory_entries (id) WHERE term_count IS NULL
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS memory_corpus_stats (
+        user_id     TEXT PRIMARY KEY,
+        doc_count   BIGINT NOT NULL DEFAULT 0,
+        total_terms BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS memory_term_stats (
+        user_id    TEXT NOT NULL,
+        term_token TEXT NOT NULL,
+        doc_freq   BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, term_token)
+    )
+    """,
+    # Per-user memory generation, bumped with every change to the user's
+    # memories; tags cached recall results (see memory_cache.RecallResultCache)
+    "ALTER TABLE memory_corpus_stats ADD COLUMN IF NOT EXISTS generation BIGINT NOT NULL DEFAULT 0",
+    # Background auto-association queue (see association_queue.py)
+    "ALTER TABLE memory_entries ADD COLUMN IF NOT EXISTS association_status TEXT",
+    """
+    CREATE TABLE IF NOT EXISTS association_jobs (
+        id         BIGSERIAL PRIMARY KEY,
+        memory_id  UUID NOT NULL,
+        user_id    TEXT NOT NULL,
+        tags       TEXT[] NOT NULL,
+        status     TEXT NOT NULL DEFAULT 'pending',
+        attempts   INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        run_after  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_association_jobs_ready
+        ON association_jobs (run_after) WHERE status = 'pending'
+    """,
+    # At most one active memory per (user, content). Before the unique index
+    # exists, deactivate older duplicates (keeping the first) and release
+    # their corpus statistics; once it exists this is a no-op.
+    f"""
+    WITH ranked AS (
+        SELECT id, row_number() OVER (PARTITION BY user_id, content_hash ORDER BY created_at, id) AS copy_number
+        FROM memory_entries
+        WHERE is_active
+          AND NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'uq_memory_entries_active_content')
+    ),
+    deactivated AS (
+        UPDATE memory_entries AS me
+        SET is_active = FALSE, updated_at = NOW()
+        FROM ranked
+        WHERE me.id = ranked.id AND ranked.copy_number > 1
+        RETURNING me.user_id, me.keyword_tokens, me.term_count
+    ),
+    released AS (
+        SELECT user_id, keyword_tokens, term_count FROM deactivated WHERE term_count IS NOT NULL
+    ),
+    {RELEASE_CORPUS_STATS_CTES}
+    SELECT COUNT(*) FROM deactivated
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_memory_entries_active_content
+        ON memory_entries (user_id, content_hash) WHERE is_active
+    """,
+    # Keyset-paginated listing; covers every listed column but the ciphertext
+    """
+    CREATE INDEX IF NOT EXISTS idx_memory_entries_user_listing
+        ON memory_entries (user_id, created_at DESC, id DESC)
+        INCLUDE (memory_type, scope, session_id, tags, access_count, expires_at)
+        WHERE is_active
+    """,
+    # Graph importance scores (see importance.py) live in relevance_score,
+    # NULL until computed. Users whose association graph changed since their
+    # scores were last computed are marked in association_graph_dirty. Before
+    # the importance index exists, clear the previously unused column and mark
+    # every user that already has associations; once it exists this is a no-op.
+    "ALTER TABLE memory_entries ALTER COLUMN relevance_score DROP DEFAULT",
+    """
+    UPDATE memory_entries SET relevance_score = NULL
+    WHERE relevance_score IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'idx_memory_entries_user_importance')
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS association_graph_dirty (
+        user_id   TEXT PRIMARY KEY,
+        marked_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+    """,
+    """
+    INSERT INTO association_graph_dirty (user_id)
+    SELECT DISTINCT me.user_id
+    FROM memory_associations ma
+    JOIN memory_entries me ON me.id = ma.source_memory_id
+    WHERE NOT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'idx_memory_entries_user_importance')
+    ON CONFLICT (user_id) DO NOTHING
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_memory_entries_user_importance
+        ON memory_entries (user_id, relevance_score DESC NULLS LAST)
+        WHERE is_active
+    """,
+    # Time-decayed association strength (see AnalogicCore.DECAY_RATE);
+    # existing edges start decaying from the migration
+    "ALTER TABLE memory_associations ADD COLUMN IF NOT EXISTS last_reinforced_at TIMESTAMPTZ NOT NULL DEFAULT NOW()",
+    # Lease on a dirty marker while importance.py recomputes the user
+    "ALTER TABLE association_graph_dirty ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ",
+]
+
+
+async def apply_migrations():
+    """Apply all pending schema migrations."""
+    async with get_connection() as conn:
+        async with conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock($1)", _MIGRATION_LOCK_ID)
+            for statement in MIGRATIONS:
+                await conn.execute(statement)
+    logger.info(f"Applied {len(MIGRATIONS)} schema migrations.")
@@ -0,0 +1,252 @@
+"""
+ranking.py - Tokenization & BM25 Relevance Scoring
+Analogic Memory System for Omnira Synora AI
+
+Provides the shared tokenizer (case folding, stopwords, light suffix
+stemming) used for both the blind keyword index and BM25 ranking of
+recalled memories against per-user corpus statistics, plus NumPy
+batch variants for scoring whole candidate windows at once, and
+extraction of the passages that best match a query.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can could did do does doing down during
+each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just me more most my myself no nor
+not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these
+they this those through to too under until up very was we were what when where
+which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+# (suffix, replacement, minimum stem length) - applied in order, first match wins
+_PLURAL_RULES = (
+    ("sses", "ss", 2),
+    ("ies", "y", 2),
+    ("s", "", 3),
+)
+_VERB_RULES = (
+    ("ingly", "", 3),
+    ("edly", "", 3),
+    ("ing", "", 3),
+    ("ed", "", 3),
+    ("ly", "", 3),
+)
+_UNDOUBLE_EXEMPT = frozenset("lsz")
+
+
+def stem(word: str) -> str:
+    """
+    Light English suffix stemmer (plural, -ed/-ing/-ly, trailing e).
+    Deliberately conservative: it only has to map inflections of a word
+    to the same term, not produce linguistic roots.
+    """
+    if len(word) <= 3 or not word.isalpha():
+        return word
+
+    for suffix, replacement, min_stem in _PLURAL_RULES:
+        if word.endswith(suffix):
+            if suffix == "s" and word.endswith(("ss", "us", "is")):
+                break
+            if len(word) - len(suffix) >= min_stem:
+                word = word[: -len(suffix)] + replacement
+            break
+
+    for suffix, replacement, min_stem in _VERB_RULES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+            word = word[: -len(suffix)] + replacement
+            if suffix in ("ing", "ed") and len(word) > 3 and word[-1] == word[-2] \
+                    and word[-1] not in _UNDOUBLE_EXEMPT:
+                word = word[:-1]
+            break
+
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Normalized terms of a text in order (stopwords removed, stemmed)."""
+    terms = []
+    for word in _TOKEN_RE.findall(text.casefold()):
+        if word in STOPWORDS or (len(word) == 1 and not word.isdigit()):
+            continue
+        terms.append(stem(word))
+    return terms
+
+
+def distinct_terms(text: str) -> list[str]:
+    """Distinct normalized terms of a text, in first-seen order."""
+    return list(dict.fromkeys(tokenize(text)))
+
+
+class BM25Scorer:
+    """
+    Okapi BM25 scorer for one query against a user's memory corpus.
+    IDF uses the non-negative variant log(1 + (N - df + 0.5) / (df + 0.5)).
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(
+        self,
+        query_terms: list[str],
+        doc_freqs: Optional[dict[str, int]] = None,
+        doc_count: int = 0,
+        avg_doc_length: float = 0.0,
+    ):
+        doc_freqs = doc_freqs or {}
+        self.query_terms = list(dict.fromkeys(query_terms))
+        self.doc_count = max(doc_count, 1)
+        self.avg_doc_length = avg_doc_length
+        self.idf = {}
+        for term in self.query_terms:
+            df = min(doc_freqs.get(term, 0), self.doc_count)
+            self.idf[term] = math.log1p((self.doc_count - df + 0.5) / (df + 0.5))
+        self.idf_vector = np.array([self.idf[t] for t in self.query_terms], dtype=np.float64)
+        # A document containing every query term once at average length scores this
+        self.reference_score = sum(self.idf.values())
+
+    def score(self, term_counts: Counter, doc_length: int) -> float:
+        """Raw BM25 score of a document given its term frequencies and length."""
+        if not self.query_terms or doc_length <= 0:
+            return 0.0
+        avg_len = self.avg_doc_length or doc_length
+        norm = self.K1 * (1 - self.B + self.B * doc_length / avg_len)
+        total = 0.0
+        for term in self.query_terms:
+            tf = term_counts.get(term, 0)
+            if tf:
+                total += self.idf[term] * tf * (self.K1 + 1) / (tf + norm)
+        return total
+
+    def normalized_score(self, term_counts: Counter, doc_length: int) -> float:
+        """BM25 score scaled to 0..1 against the query's reference score."""
+        if self.reference_score <= 0:
+            return 0.0
+        return min(1.0, self.score(term_counts, doc_length) / self.reference_score)
+
+    def term_frequency_row(self, doc_terms: list[str]) -> list[int]:
+        """Frequencies of each query term (in query_terms order) within a document."""
+        counts = Counter(doc_terms)
+        return [counts.get(term, 0) for term in self.query_terms]
+
+    def normalized_scores(self, term_frequencies: np.ndarray, doc_lengths: np.ndarray) -> np.ndarray:
+        """
+        Vectorized normalized_score for a batch of documents.
+        term_frequencies: (n_docs, n_query_terms) counts; doc_lengths: (n_docs,)
+        """
+        n_docs = len(doc_lengths)
+        if not self.query_terms or self.reference_score <= 0 or n_docs == 0:
+            return np.zeros(n_docs)
+        tf = np.asarray(term_frequencies, dtype=np.float64).reshape(n_docs, len(self.query_terms))
+        lengths = np.asarray(doc_lengths, dtype=np.float64)
+        avg_len = np.full(n_docs, self.avg_doc_length) if self.avg_doc_length else lengths
+        with np.errstate(divide="ignore", invalid="ignore"):
+            norm = self.K1 * (1 - self.B + self.B * lengths / avg_len)
+            contributions = self.idf_vector * tf * (self.K1 + 1) / (tf + norm[:, None])
+        contributions = np.nan_to_num(contributions, nan=0.0, posinf=0.0)
+        scores = contributions.sum(axis=1) / self.reference_score
+        scores[lengths <= 0] = 0.0
+        return np.minimum(scores, 1.0)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores in descending order, without a full sort."""
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(n)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def best_snippets(text: str, query_terms: list[str], budget_chars: int, max_windows: int = 1) -> list[str]:
+    """
+    Passages of text around query term hits, at most budget_chars in total.
+    Windows are chosen greedily to cover the most query terms not covered by
+    earlier windows (then the most distinct terms, then the most hits), never
+    overlap or repeat a passage, are narrowed to word boundaries and are
+    returned in text order, with an ellipsis (counted against the budget)
+    where text was cut. Without hits, the text's opening is used.
+    """
+    if len(text) <= budget_chars:
+        return [text]
+    wanted = set(query_terms)
+    hits = [
+        (m.start(), m.end(), term)
+        for m in _TOKEN_RE.finditer(text)
+        if (term := stem(m.group().casefold())) in wanted
+    ]
+    # Each window may carry two ellipses
+    window_chars = max(budget_chars // max(max_windows, 1) - 2, 1)
+
+    spans = []
+    seen_terms: set[str] = set()
+    while hits and len(spans) < max_windows:
+        best, best_key, best_terms = None, (0, 0, 0), set()
+        for i, (start, _, _) in enumerate(hits):
+            covered = []
+            for hit in hits[i:]:
+                if hit[1] - start > window_chars:
+                    break
+                covered.append(hit)
+            if not covered:
+                continue
+            terms = {h[2] for h in covered}
+            key = (len(terms - seen_terms), len(terms), len(covered))
+            if key > best_key:
+                best, best_key, best_terms = (start, covered[-1][1]), key, terms
+        if best is None:
+            break
+        # Centre the hits in the window
+        slack = window_chars - (best[1] - best[0])
+        start = max(0, best[0] - slack // 2)
+        end = min(len(text), start + window_chars)
+        start = max(0, end - window_chars)
+        # Give way to the windows already chosen (their hits are gone, so the
+        # chosen hits lie between them)
+        for taken_start, taken_end in spans:
+            if taken_end <= best[0]:
+                start = max(start, taken_end)
+            elif taken_start >= best[1]:
+                end = min(end, taken_start)
+        spans.append((start, end))
+        seen_terms |= best_terms
+        hits = [h for h in hits if h[1] <= start or h[0] >= end]
+    if not spans:
+        spans = [(0, window_chars)]
+
+    merged: list[list[int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    snippets = []
+    for start, end in merged:
+        # Don't cut words in half
+        if start > 0 and not text[start - 1].isspace():
+            space = text.find(" ", start, end)
+            start = space + 1 if space != -1 else start
+        if end < len(text) and not text[end].isspace():
+            space = text.rfind(" ", start, end)
+            end = space if space > start else end
+        snippet = ("…" if start > 0 else "") + text[start:end].strip() + ("…" if end < len(text) else "")
+        if snippet not in snippets:
+            snippets.append(snippet)
+    return snippets
@@ -10,9 +10,15 @@ import hmac
 import secrets
 import base64
 import logging
-from typing import Tuple
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, Union
 
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
@@ -24,6 +30,22 @@ _MASTER_KEY_HEX = os.getenv("MASTER_ENCRYPTION_KEY", "")
 _API_SECRET = os.getenv("API_SECRET_KEY", secrets.token_hex(32))
 
 NONCE_SIZE = 12  # 96-bit nonce for AES-GCM
+TAG_SIZE = 16    # 128-bit AES-GCM authentication tag
+
+# Per-user key schemes. Version 1 blobs are headerless (nonce + ciphertext);
+# later versions are prefixed with a single version byte.
+KEY_VERSION_PBKDF2 = 1
+KEY_VERSION_HKDF = 2
+CURRENT_KEY_VERSION = KEY_VERSION_HKDF
+
+# Derived per-user key cache (see derive_user_key)
+USER_KEY_CACHE_SIZE = int(os.getenv("USER_KEY_CACHE_SIZE", "1024"))
+USER_KEY_CACHE_TTL_SECONDS = float(os.getenv("USER_KEY_CACHE_TTL_SECONDS", "900"))
+
+# Batch crypto: batches larger than the threshold are split across a thread
+# pool (AES-GCM in `cryptography` releases the GIL while it works).
+CRYPTO_WORKERS = int(os.getenv("CRYPTO_WORKERS", "4"))
+CRYPTO_PARALLEL_THRESHOLD = int(os.getenv("CRYPTO_PARALLEL_THRESHOLD", "64"))
 
 
 def _get_master_key() -> bytes:
@@ -99,40 +121,266 @@ def hash_api_token(token: str) -> str:
     return hashlib.sha256(token.encode()).hexdigest()
 
 
-def derive_user_key(user_id: str) -> bytes:
+class _UserKeyCache:
+    """
+    Thread-safe, size-bounded LRU cache of derived per-user keys, keyed by
+    (user_id, key_version).
+    Each entry holds the raw key and a ready-to-use AESGCM cipher and
+    expires after a TTL. Evicted key material is zeroed in place.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple[str, int], tuple[bytearray, AESGCM, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str, version: int) -> Tuple[bytes, AESGCM]:
+        """
+        The user's key and cipher. The key is returned as an immutable copy
+        taken under the lock, never the cached buffer that eviction wipes.
+        """
+        cache_key = (user_id, version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                if entry[2] > now:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return bytes(entry[0]), entry[1]
+                self._evict(cache_key)
+            self.misses += 1
+
+        # Derive outside the lock so one slow PBKDF2 run does not stall other users
+        key = _derive_user_key_uncached(user_id, version)
+        cipher = AESGCM(key)
+        if self.max_size <= 0:
+            return key, cipher
+
+        with self._lock:
+            if cache_key in self._entries:
+                self._evict(cache_key)
+            self._entries[cache_key] = (bytearray(key), cipher, now + self.ttl_seconds)
+            while len(self._entries) > self.max_size:
+                self._evict(next(iter(self._entries)))
+        return key, cipher
+
+    def invalidate(self, user_id: Optional[str] = None) -> int:
+        """Drop one user's cached key (or all keys when user_id is None)."""
+        with self._lock:
+            cache_keys = [k for k in self._entries if user_id is None or k[0] == user_id]
+            for cache_key in cache_keys:
+                self._evict(cache_key)
+            return len(cache_keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _evict(self, cache_key: tuple[str, int]):
+        # Caller must hold the lock. The AESGCM object keeps its own copy of
+        # the key which is released with the object; ours is wiped explicitly.
+        key, _, _ = self._entries.pop(cache_key)
+        for i in range(len(key)):
+            key[i] = 0
+        self.evictions += 1
+
+
+_user_key_cache = _UserKeyCache(USER_KEY_CACHE_SIZE, USER_KEY_CACHE_TTL_SECONDS)
+
+
+def _derive_user_key_uncached(user_id: str, version: int) -> bytes:
+    if version == KEY_VERSION_HKDF:
+        # MASTER_KEY is already uniformly random, so a single HKDF expansion
+        # is sufficient; no password stretching is needed.
+        hkdf = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=b"analogic-memory/user-key",
+            info=b"v2:" + user_id.encode(),
+            backend=default_backend()
+        )
+        return hkdf.derive(MASTER_KEY)
+    if version == KEY_VERSION_PBKDF2:
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=user_id.encode(),
+            iterations=100_000,
+            backend=default_backend()
+        )
+        return kdf.derive(MASTER_KEY)
+    raise ValueError(f"Unknown key version: {version}")
+
+
+def derive_user_key(user_id: str, version: int = CURRENT_KEY_VERSION) -> bytes:
     """
     Derive a per-user sub-key from the master key.
     Enables per-user key rotation without re-encrypting all data.
+    Derived keys are cached; call invalidate_user_key() after a rotation.
     """
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=user_id.encode(),
-        iterations=100_000,
-        backend=default_backend()
-    )
-    return kdf.derive(MASTER_KEY)
+    key, _ = _user_key_cache.get(user_id, version)
+    return key
 
 
-def encrypt_with_user_key(plaintext: str, user_id: str) -> bytes:
-    """Encrypt using a user-specific derived key."""
-    user_key = derive_user_key(user_id)
+def invalidate_user_key(user_id: Optional[str] = None) -> int:
+    """Evict cached key material for a user (or every user). Returns entries removed."""
+    return _user_key_cache.invalidate(user_id)
+
+
+def key_cache_stats() -> dict:
+    """Hit/miss counters and occupancy of the derived key cache."""
+    return _user_key_cache.stats()
+
+
+def key_version_of(encrypted_data: bytes) -> int:
+    """
+    Best-effort key version of a blob from its header byte.
+    A legacy blob whose random nonce happens to start with a version byte
+    is still decrypted correctly by decrypt_with_user_key's fallback.
+    """
+    if len(encrypted_data) >= 1 + NONCE_SIZE + TAG_SIZE and encrypted_data[0] == KEY_VERSION_HKDF:
+        return KEY_VERSION_HKDF
+    return KEY_VERSION_PBKDF2
+
+
+def _encrypt_blob(plaintext: str, aesgcm: AESGCM) -> bytes:
     nonce = secrets.token_bytes(NONCE_SIZE)
-    aesgcm = AESGCM(user_key)
     ciphertext = aesgcm.encrypt(nonce, plaintext.encode("utf-8"), None)
-    return nonce + ciphertext
+    return bytes([CURRENT_KEY_VERSION]) + nonce + ciphertext
 
 
-def decrypt_with_user_key(encrypted_data: bytes, user_id: str) -> str:
-    """Decrypt using a user-specific derived key."""
-    user_key = derive_user_key(user_id)
+def _decrypt_blob(encrypted_data: bytes, cipher_for: Callable[[int], AESGCM]) -> str:
+    if key_version_of(encrypted_data) == KEY_VERSION_HKDF:
+        nonce = encrypted_data[1:1 + NONCE_SIZE]
+        try:
+            plaintext = cipher_for(KEY_VERSION_HKDF).decrypt(nonce, encrypted_data[1 + NONCE_SIZE:], None)
+            return plaintext.decode("utf-8")
+        except InvalidTag:
+            pass  # Legacy blob whose nonce began with the version byte
+
     nonce = encrypted_data[:NONCE_SIZE]
     ciphertext = encrypted_data[NONCE_SIZE:]
-    aesgcm = AESGCM(user_key)
-    plaintext = aesgcm.decrypt(nonce, ciphertext, None)
+    plaintext = cipher_for(KEY_VERSION_PBKDF2).decrypt(nonce, ciphertext, None)
     return plaintext.decode("utf-8")
 
 
+def _user_cipher_resolver(user_id: str) -> Callable[[int], AESGCM]:
+    """Look up each key version's cipher at most once for a batch."""
+    ciphers: dict[int, AESGCM] = {}
+
+    def cipher_for(version: int) -> AESGCM:
+        if version not in ciphers:
+            ciphers[version] = _user_key_cache.get(user_id, version)[1]
+        return ciphers[version]
+
+    return cipher_for
+
+
+def encrypt_with_user_key(plaintext: str, user_id: str) -> bytes:
+    """
+    Encrypt using a user-specific derived key.
+    Returns: version (1 byte) + nonce (12 bytes) + ciphertext+tag
+    """
+    _, aesgcm = _user_key_cache.get(user_id, CURRENT_KEY_VERSION)
+    return _encrypt_blob(plaintext, aesgcm)
+
+
+def decrypt_with_user_key(encrypted_data: bytes, user_id: str) -> str:
+    """Decrypt using a user-specific derived key. Accepts v1 and v2 blobs."""
+    return _decrypt_blob(encrypted_data, lambda version: _user_key_cache.get(user_id, version)[1])
+
+
+_crypto_pool: Optional[ThreadPoolExecutor] = None
+_crypto_pool_lock = threading.Lock()
+
+
+def _get_crypto_pool() -> ThreadPoolExecutor:
+    global _crypto_pool
+    with _crypto_pool_lock:
+        if _crypto_pool is None:
+            _crypto_pool = ThreadPoolExecutor(max_workers=CRYPTO_WORKERS, thread_name_prefix="crypto")
+        return _crypto_pool
+
+
+def _map_batch(fn: Callable, items: list) -> list:
+    """Apply fn to every item in order, catching per-item errors."""
+    def run(chunk: list) -> list:
+        results = []
+        for item in chunk:
+            try:
+                results.append(fn(item))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    if len(items) <= CRYPTO_PARALLEL_THRESHOLD or CRYPTO_WORKERS <= 1:
+        return run(items)
+
+    chunk_size = -(-len(items) // CRYPTO_WORKERS)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    futures = [_get_crypto_pool().submit(run, chunk) for chunk in chunks]
+    return [result for future in futures for result in future.result()]
+
+
+def encrypt_many_with_user_key(plaintexts: list[str], user_id: str) -> list[Union[bytes, Exception]]:
+    """
+    Encrypt many plaintexts for one user with a single key lookup.
+    Results are returned in input order; a failed item yields its exception.
+    """
+    _, aesgcm = _user_key_cache.get(user_id, CURRENT_KEY_VERSION)
+    return _map_batch(lambda plaintext: _encrypt_blob(plaintext, aesgcm), plaintexts)
+
+
+def decrypt_many_with_user_key(blobs: list[bytes], user_id: str) -> list[Union[str, Exception]]:
+    """
+    Decrypt many blobs for one user with a single key lookup per key version.
+    Results are returned in input order; a failed item yields its exception.
+    """
+    cipher_for = _user_cipher_resolver(user_id)
+    return _map_batch(lambda blob: _decrypt_blob(blob, cipher_for), blobs)
+
+
+# ─────────────────────────────────────────────
+# BLIND KEYWORD INDEX
+# ─────────────────────────────────────────────
+
+BLIND_INDEX_TOKEN_BYTES = 16  # 128-bit truncated HMAC per term
+
+_BLIND_INDEX_ROOT_KEY = HKDF(
+    algorithm=hashes.SHA256(),
+    length=32,
+    salt=b"analogic-memory/blind-index",
+    info=b"v1",
+    backend=default_backend()
+).derive(MASTER_KEY)
+
+
+def blind_index_tokens(terms: list[str], user_id: str) -> list[str]:
+    """
+    Keyed HMAC tokens for normalized terms (see ranking.tokenize), scoped to one user.
+    Tokens allow equality matching in SQL without revealing the terms,
+    and the same term produces unrelated tokens for different users.
+    """
+    user_key = hmac.new(_BLIND_INDEX_ROOT_KEY, user_id.encode(), hashlib.sha256).digest()
+    tokens = []
+    for term in terms:
+        digest = hmac.new(user_key, term.encode("utf-8"), hashlib.sha256).digest()
+        tokens.append(digest[:BLIND_INDEX_TOKEN_BYTES].hex())
+    return tokens
+
+
 def sanitize_input(text: str, max_length: int = 50_000) -> str:
     """Basic input sanitization."""
     if not isinstance(text, str):
@@ -0,0 +1,62 @@
+"""
+singleflight.py - Coalescing of Concurrent Identical Reads
+Analogic Memory System for Omnira Synora AI
+
+When several requests for the same key are in flight at once, only the
+first one executes; the others wait for and share its result (or its
+exception). Nothing is cached once the execution completes.
+
+The shared execution runs as its own task in an empty context, so it
+never borrows a caller's unit-of-work connection and is not cancelled
+when one of the waiting requests is (e.g. a client disconnect).
+"""
+
+import asyncio
+import contextvars
+import logging
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Per-process registry of in-flight executions keyed by request identity."""
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn() unless an identical call is already running, and return its result.
+        Callers receive the same object; copy it before mutating.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(fn(), context=contextvars.Context())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieved here so an execution whose waiters all left is not reported as unhandled
+            logger.debug(f"Coalesced call failed: {task.exception()}")
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
+
+
+read_flights = SingleFlight()
@@ -0,0 +1,133 @@
+"""Tests for graph_cache.AssociationGraph - adjacency, decay and traversal."""
+
+import asyncio
+import math
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+from graph_cache import AssociationGraph, AssociationGraphCache
+
+TYPES = ["related_to", "leads_to", "similar_to"]
+DAY = 86400
+
+
+def edge(source, target, association_type="leads_to", strength=0.8, age_days=0.0):
+    return {
+        "id": uuid4(),
+        "source_memory_id": source,
+        "target_memory_id": target,
+        "association_type": association_type,
+        "strength": strength,
+        "created_at": None,
+        "last_reinforced_at": datetime.now(timezone.utc) - timedelta(days=age_days),
+    }
+
+
+@pytest.fixture
+def nodes():
+    return [uuid4() for _ in range(5)]
+
+
+def test_adjacency_includes_overlay_and_respects_limit(nodes):
+    a, b, c, d, _ = nodes
+    graph = AssociationGraph([edge(a, b), edge(a, c)], TYPES)
+    graph.upsert_edge(edge(a, d, strength=0.4))
+    node = graph.node_index[a]
+
+    neighbours, strengths, _ = graph.adjacency(node, "outgoing")
+    assert {graph.node_ids[n] for n in neighbours} == {b, c, d}
+    assert len(graph.adjacency(node, "outgoing", limit=2)[0]) == 2
+    assert len(graph.adjacency(node, "outgoing", limit=0)[0]) == 0
+    assert [graph.node_ids[n] for n in graph.adjacency(graph.node_index[d], "incoming")[0]] == [a]
+
+
+def test_remove_edge_masks_base_and_overlay(nodes):
+    a, b, c, _, _ = nodes
+    graph = AssociationGraph([edge(a, b)], TYPES)
+    graph.upsert_edge(edge(a, c))
+    graph.remove_edge(a, b, "leads_to")
+    graph.remove_edge(a, c, "leads_to")
+    assert graph.edge_count == 0
+    assert graph.edges_of([a]) == []
+
+
+def test_effective_strength_halves_per_half_life(nodes):
+    a, b, c, _, _ = nodes
+    rate = math.log(2) / (30 * DAY)
+    graph = AssociationGraph([edge(a, b, strength=0.8, age_days=30), edge(a, c, strength=0.8)], TYPES, rate)
+    strengths = {e["target_memory_id"]: e["strength"] for e in graph.edges_of([a])}
+    assert strengths[b] == pytest.approx(0.4, rel=1e-3)
+    assert strengths[c] == pytest.approx(0.8, rel=1e-3)
+
+
+def test_compact_keeps_stored_strength(nodes):
+    a, b, c, _, _ = nodes
+    rate = math.log(2) / (30 * DAY)
+    graph = AssociationGraph([edge(a, b, strength=0.8, age_days=30)], TYPES, rate)
+    graph.upsert_edge(edge(b, c, strength=0.6, age_days=30))
+    graph.compact()
+    strengths = sorted(e["strength"] for e in graph.edges_of([a, b, c]))
+    assert strengths == pytest.approx([0.3, 0.4], rel=1e-3)
+
+
+def test_traverse_terminates_on_cycles_and_reports_depths(nodes):
+    a, b, c, d, _ = nodes
+    graph = AssociationGraph([edge(a, b), edge(b, c), edge(c, a), edge(c, d)], TYPES)
+    depth_of, edges, truncated = graph.traverse([a], max_depth=5, direction="outgoing")
+    depths = {graph.node_ids[n]: depth for n, depth in depth_of.items()}
+    assert depths == {a: 0, b: 1, c: 2, d: 3}
+    assert len(edges) == 4  # The edge closing the cycle is reported once
+    assert not truncated
+
+
+def test_traverse_filters_types_strength_and_direction(nodes):
+    a, b, c, d, _ = nodes
+    graph = AssociationGraph(
+        [edge(a, b, "leads_to", 0.9), edge(a, c, "similar_to", 0.9), edge(a, d, "leads_to", 0.1), edge(b, a)],
+        TYPES,
+    )
+    depth_of, edges, _ = graph.traverse(
+        [a], max_depth=1, direction="outgoing", type_codes={graph.type_codes["leads_to"]}, min_strength=0.5
+    )
+    assert {graph.node_ids[n] for n in depth_of} == {a, b}
+    assert [(e["source_memory_id"], e["target_memory_id"]) for e in edges] == [(a, b)]
+
+    depth_of, _, _ = graph.traverse([b], max_depth=1, direction="incoming")
+    assert {graph.node_ids[n] for n in depth_of} == {b, a}
+
+
+def test_traverse_budgets_truncate(nodes):
+    hub, *leaves = nodes
+    graph = AssociationGraph([edge(hub, leaf, strength=0.1 * (i + 1)) for i, leaf in enumerate(leaves)], TYPES)
+
+    depth_of, edges, truncated = graph.traverse([hub], max_depth=2, max_edges=2)
+    assert truncated and len(edges) == 2
+    assert [e["target_memory_id"] for e in edges] == [leaves[3], leaves[2]]  # Strongest first
+
+    depth_of, edges, truncated = graph.traverse([hub], max_depth=2, max_nodes=3)
+    assert truncated and len(depth_of) == 3
+
+
+def test_traverse_ignores_unknown_seeds(nodes):
+    a, b, _, _, _ = nodes
+    graph = AssociationGraph([edge(a, b)], TYPES)
+    assert graph.traverse([uuid4()], max_depth=2) == ({}, [], False)
+
+
+def test_cache_marks_graphs_over_budget_as_oversized(nodes):
+    a, b, c, _, _ = nodes
+    cache = AssociationGraphCache(max_bytes=1, ttl_seconds=60)
+    loads = 0
+
+    async def loader():
+        nonlocal loads
+        loads += 1
+        return AssociationGraph([edge(a, b), edge(b, c)], TYPES)
+
+    graph = asyncio.run(cache.get("user", loader))
+    assert graph.edge_count == 2  # Still served to the caller that loaded it
+    assert cache.is_oversized("user")
+    assert not cache.is_oversized("other")
+    assert cache.stats()["users"] == 0 and cache.stats()["oversized_users"] == 1
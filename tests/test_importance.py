@@ -0,0 +1,43 @@
+"""Tests for graph_cache.personalized_pagerank, the importance score model."""
+
+import numpy as np
+import pytest
+
+from graph_cache import personalized_pagerank
+
+
+def edges(*pairs):
+    src, dst = zip(*pairs)
+    return np.array(src), np.array(dst), np.ones(len(pairs))
+
+
+def test_scores_form_a_distribution():
+    src, dst, weights = edges((0, 1), (1, 2), (2, 0), (3, 0))
+    rank = personalized_pagerank(4, src, dst, weights, np.ones(4))
+    assert rank.sum() == pytest.approx(1.0)
+    assert (rank > 0).all()
+
+
+def test_hub_ranks_highest():
+    src, dst, weights = edges((1, 0), (2, 0), (3, 0), (4, 0))
+    rank = personalized_pagerank(5, src, dst, weights, np.ones(5))
+    assert rank.argmax() == 0
+
+
+def test_personalization_biases_scores():
+    src, dst, weights = edges((0, 1), (1, 0), (2, 3), (3, 2))
+    rank = personalized_pagerank(4, src, dst, weights, np.array([10.0, 1.0, 1.0, 1.0]))
+    assert rank[0] + rank[1] > rank[2] + rank[3]
+
+
+def test_edge_weights_split_outgoing_mass():
+    src, dst = np.array([0, 0]), np.array([1, 2])
+    rank = personalized_pagerank(3, src, dst, np.array([0.9, 0.1]), np.array([1.0, 0.0, 0.0]))
+    assert rank[1] > rank[2]
+
+
+def test_graph_without_edges_returns_personalization():
+    empty = np.array([], dtype=np.int64)
+    rank = personalized_pagerank(3, empty, empty, np.array([]), np.ones(3))
+    assert rank == pytest.approx([1 / 3] * 3)
+    assert personalized_pagerank(0, empty, empty, np.array([]), np.array([])).size == 0
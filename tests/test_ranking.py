@@ -0,0 +1,81 @@
+"""Tests for ranking.py - tokenizer, BM25 scoring, top-k and snippets."""
+
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from ranking import BM25Scorer, best_snippets, distinct_terms, stem, tokenize, top_k_indices
+
+
+@pytest.mark.parametrize("inflected, base", [
+    ("memories", "memory"),
+    ("running", "run"),
+    ("stored", "stor"),
+    ("store", "stor"),
+    ("classes", "class"),
+    ("quickly", "quick"),
+])
+def test_stem_maps_inflections_to_one_term(inflected, base):
+    assert stem(inflected) == stem(base)
+
+
+def test_stem_leaves_short_and_non_alpha_words():
+    assert stem("bus") == "bus"
+    assert stem("x86s") == "x86s"
+
+
+def test_tokenize_drops_stopwords_and_single_letters():
+    assert tokenize("The cat and a dog") == ["cat", "dog"]
+    assert tokenize("Version 2 of X") == ["version", "2"]
+
+
+def test_distinct_terms_keeps_first_seen_order():
+    assert distinct_terms("dogs chase cats; cats chase dogs") == ["dog", "chas", "cat"]
+
+
+def test_bm25_rare_terms_weigh_more():
+    scorer = BM25Scorer(["rare", "common"], {"rare": 1, "common": 90}, doc_count=100, avg_doc_length=10)
+    assert scorer.idf["rare"] > scorer.idf["common"]
+    assert scorer.score(Counter({"rare": 1}), 10) > scorer.score(Counter({"common": 1}), 10)
+
+
+def test_bm25_batch_matches_single_scores():
+    scorer = BM25Scorer(["alpha", "beta"], {"alpha": 3, "beta": 10}, doc_count=50, avg_doc_length=8)
+    docs = [["alpha", "alpha", "gamma"], ["beta"] * 4 + ["x"] * 12, [], ["alpha", "beta"]]
+    tf = np.array([scorer.term_frequency_row(doc) for doc in docs])
+    batch = scorer.normalized_scores(tf, np.array([len(doc) for doc in docs]))
+    single = [scorer.normalized_score(Counter(doc), len(doc)) for doc in docs]
+    assert batch == pytest.approx(single)
+    assert batch[2] == 0.0
+
+
+def test_top_k_indices_orders_descending():
+    scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3])
+    assert top_k_indices(scores, 3).tolist() == [1, 3, 2]
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 4, 0]
+    assert top_k_indices(scores, 0).tolist() == []
+
+
+def test_best_snippets_returns_short_text_whole():
+    assert best_snippets("short text", ["text"], 50) == ["short text"]
+
+
+def test_best_snippets_never_repeats_a_passage():
+    text = "alpha beta gamma " * 3 + "x" * 50 + " alpha delta"
+    snippets = best_snippets(text, ["alpha", "gamma", "delta"], 40, 3)
+    assert snippets == ["…gamma alpha…", "…alpha delta"]
+
+
+@pytest.mark.parametrize("budget, windows", [(20, 1), (40, 3), (60, 2), (33, 4)])
+def test_best_snippets_stay_within_budget(budget, windows):
+    text = " ".join(f"filler{i} alpha word{i} delta" for i in range(30))
+    snippets = best_snippets(text, ["alpha", "delta"], budget, windows)
+    assert snippets
+    assert sum(len(s) for s in snippets) <= budget
+    assert len(set(snippets)) == len(snippets)
+
+
+def test_best_snippets_without_hits_uses_opening():
+    text = "opening words " + "z" * 100
+    assert best_snippets(text, ["absent"], 20)[0].startswith("opening")
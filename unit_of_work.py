@@ -0,0 +1,106 @@
+"""
+unit_of_work.py - Request-Scoped Connection Sharing
+Analogic Memory System for Omnira Synora AI
+
+Lets a group of MemoryEngine / AnalogicCore / BackupSystem calls share
+one pooled connection and one transaction:
+
+    async with unit_of_work():
+        await engine.store_memory(...)
+        await analogic.create_association(...)
+
+Inside a unit of work, every get_connection() from this module yields
+the same connection; outside one it checks a connection out of the pool
+exactly like database.get_connection(). Calls within a unit of work must
+run sequentially - an asyncpg connection cannot serve concurrent queries.
+
+In-process state derived from a write (e.g. cached graphs) is updated via
+after_commit(), so a rolled-back unit of work leaves no trace in it.
+"""
+
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, Optional
+
+from database import get_connection as pool_connection
+
+logger = logging.getLogger(__name__)
+
+_current_connection: ContextVar[Optional[object]] = ContextVar("analogic_unit_of_work", default=None)
+_after_commit: ContextVar[Optional[list[Callable[[], None]]]] = ContextVar("analogic_after_commit", default=None)
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator:
+    """
+    Open a transaction on one pooled connection and share it with all
+    get_connection() calls in this context. Nested units of work join the
+    outer one. The transaction commits on exit and rolls back on error.
+    """
+    conn = _current_connection.get()
+    if conn is not None:
+        yield conn
+        return
+
+    callbacks: list[Callable[[], None]] = []
+    async with pool_connection() as conn:
+        async with conn.transaction():
+            token = _current_connection.set(conn)
+            callbacks_token = _after_commit.set(callbacks)
+            try:
+                yield conn
+            finally:
+                _after_commit.reset(callbacks_token)
+                _current_connection.reset(token)
+
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"After-commit callback failed: {e}")
+
+
+@asynccontextmanager
+async def savepoint() -> AsyncIterator:
+    """
+    Nested transaction inside the current unit of work. If it rolls back,
+    after_commit() callbacks registered inside it are discarded too.
+    """
+    conn = _current_connection.get()
+    if conn is None:
+        raise RuntimeError("savepoint() requires an open unit of work.")
+    callbacks = _after_commit.get()
+    mark = len(callbacks)
+    try:
+        async with conn.transaction():
+            yield conn
+    except BaseException:
+        del callbacks[mark:]
+        raise
+
+
+def after_commit(callback: Callable[[], None]):
+    """Run callback once the current unit of work commits (immediately outside one)."""
+    callbacks = _after_commit.get()
+    if callbacks is None:
+        callback()
+    else:
+        callbacks.append(callback)
+
+
+def in_unit_of_work() -> bool:
+    """Whether the current context has an open unit of work."""
+    return _current_connection.get() is not None
+
+
+@asynccontextmanager
+async def get_connection() -> AsyncIterator:
+    """Yield the current unit of work's connection, or a pooled one if none is active."""
+    conn = _current_connection.get()
+    if conn is not None:
+        yield conn
+        return
+
+    async with pool_connection() as conn:
+        yield conn